@@ -1,66 +1,487 @@
 import requests
 import os
+import re
+import time
+import hashlib
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Endpoints
 BASE_URL = os.getenv("BASE_URL", "localhost")
 experiments_url = f"http://{BASE_URL}:5000/api/2.0/mlflow/experiments/search"
 runs_url = f"http://{BASE_URL}:5000/api/2.0/mlflow/runs/search"
+history_url = f"http://{BASE_URL}:5000/api/2.0/mlflow/metrics/get-history"
 
-# Optional: Query parameters
-params = {
-    "max_results": 8
+# Page size for the experiments listing; every page is followed via next_page_token
+EXPERIMENTS_PAGE_SIZE = int(os.getenv("EXPERIMENTS_PAGE_SIZE", "100"))
+
+# HTTP client settings for the calls to the MLflow server. They are sized so
+# that a slow call fails (and only its experiment is skipped) well before the
+# Lambda timeout kills the whole invocation
+CONNECT_TIMEOUT = float(os.getenv("MLFLOW_CONNECT_TIMEOUT", "0.5"))
+READ_TIMEOUT = float(os.getenv("MLFLOW_READ_TIMEOUT", "0.8"))
+MAX_RETRIES = int(os.getenv("MLFLOW_MAX_RETRIES", "1"))
+RETRY_BACKOFF = float(os.getenv("MLFLOW_RETRY_BACKOFF", "0.1"))
+POOL_SIZE = int(os.getenv("MLFLOW_POOL_SIZE", "10"))
+
+# Overall budget of a scrape. Inside the handler it is further capped by the
+# time the Lambda has left, minus a margin to build and return the response
+SCRAPE_TIMEOUT_SECONDS = float(os.getenv("SCRAPE_TIMEOUT_SECONDS", "8"))
+DEADLINE_MARGIN_SECONDS = float(os.getenv("DEADLINE_MARGIN_SECONDS", "0.5"))
+
+# Maximum number of runs/search requests in flight at the same time (kept below POOL_SIZE)
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))
+
+# Labels of every exported series, in exposition order. Run names are stable
+# across re-runs of the same config, unlike run ids
+SERIES_LABELS = ("experiment", "model_type", "run_name")
+
+# When enabled, the step history of each metric is also exported as timestamped samples
+EXPORT_METRIC_HISTORY = os.getenv("EXPORT_METRIC_HISTORY", "false").lower() in ("1", "true", "yes")
+
+# Response cache: fresh for CACHE_TTL_SECONDS, then served stale for up to
+# CACHE_STALE_SECONDS more while a background refresh runs
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "15"))
+CACHE_STALE_SECONDS = float(os.getenv("CACHE_STALE_SECONDS", "60"))
+
+# Module-level state survives between warm invocations of the same Lambda container
+_cache = {"body": None, "etag": None, "fetched_at": 0.0}
+_cache_lock = threading.Lock()
+_refresh_running = threading.Event()
+
+# Self-instrumentation of the exporter (mlflow_exporter_* series). Counters and
+# histograms are cumulative for the lifetime of the Lambda container
+UPSTREAM_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+_stats_lock = threading.Lock()
+_exporter_stats = {
+    "scrapes": 0,
+    "cache_hits": 0,
+    "experiments_scanned": 0,
+    "runs_scanned": 0,
+    "series_emitted": 0
 }
+_upstream_latency = {}
+_cold_start = True
 
-def metrics_handler(event, context):
+# Latest run seen per experiment (experiment_id -> {"run", "labels", "history"}).
+# The run end_time is the watermark: later scrapes only ask MLflow for runs
+# that finished after it
+_latest_runs = {}
+
+def create_session():
     """
-    This handler takes the data from the MLflow API and returns data in Prometheus format.
+    Creates a keep-alive session with a connection pool and bounded retries
+    (exponential backoff) on connection errors and transient 5xx responses.
+    Read timeouts are not retried: the server is already slow.
     """
+    retry = Retry(
+        total=MAX_RETRIES,
+        read=0,
+        backoff_factor=RETRY_BACKOFF,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "POST"]),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
 
-    response = requests.get(experiments_url, params=params)
-    if response.status_code != 200:
-        raise Exception(f"Failed to get experiments: {response.text}")
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
-    experiments = response.json().get("experiments", [])
-    if not experiments:
-        raise Exception("No experiments found.")   
-    
-    experiments = [exp for exp in experiments if exp['name'] != "Default"]
-    experiment_ids = [exp['experiment_id'] for exp in experiments]
+# Created once per Lambda container, so warm invocations reuse open connections
+session = create_session()
+
+def get_scrape_deadline(context=None):
+    """
+    Returns the time.monotonic() deadline of a scrape: SCRAPE_TIMEOUT_SECONDS
+    from now, or earlier if the Lambda invocation has less time left.
+    """
+    budget = SCRAPE_TIMEOUT_SECONDS
+    if context is not None and hasattr(context, "get_remaining_time_in_millis"):
+        budget = min(budget, context.get_remaining_time_in_millis() / 1000 - DEADLINE_MARGIN_SECONDS)
+    return time.monotonic() + budget
+
+def request_timeout(deadline):
+    """
+    Returns the (connect, read) timeout of a request, capped by the time left
+    until the scrape deadline. Raises TimeoutError once the deadline passed.
+    """
+    if deadline is None:
+        return CONNECT_TIMEOUT, READ_TIMEOUT
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Scrape deadline exceeded")
+    return min(CONNECT_TIMEOUT, remaining), min(READ_TIMEOUT, remaining)
+
+def mlflow_request(method, url, deadline=None, **kwargs):
+    """
+    Sends a request to the MLflow server through the pooled session and logs its latency.
+    """
+    endpoint = url.rsplit('/mlflow/', 1)[-1]
+    timeout = request_timeout(deadline)
+    start = time.perf_counter()
+    response = session.request(method, url, timeout=timeout, **kwargs)
+    elapsed = time.perf_counter() - start
+    print(f"{method} {endpoint} -> {response.status_code} in {elapsed * 1000:.1f} ms")
+    observe_upstream_latency(endpoint, elapsed)
+    return response
+
+def observe_upstream_latency(endpoint, seconds):
+    """
+    Records an upstream call duration in the per-endpoint latency histogram.
+    """
+    with _stats_lock:
+        histogram = _upstream_latency.setdefault(
+            endpoint, {"buckets": [0] * len(UPSTREAM_LATENCY_BUCKETS), "sum": 0.0, "count": 0}
+        )
+        for i, bound in enumerate(UPSTREAM_LATENCY_BUCKETS):
+            if seconds <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+def count_stat(name, amount=1):
+    """
+    Increments one of the exporter counters.
+    """
+    with _stats_lock:
+        _exporter_stats[name] += amount
 
+def iter_experiments(deadline=None):
+    """
+    Yields every experiment registered in MLflow, following next_page_token.
+    """
+    page_token = None
+    while True:
+        params = {"max_results": EXPERIMENTS_PAGE_SIZE}
+        if page_token:
+            params["page_token"] = page_token
+
+        response = mlflow_request("GET", experiments_url, deadline=deadline, params=params)
+        if response.status_code != 200:
+            raise Exception(f"Failed to get experiments: {response.text}")
+
+        payload = response.json()
+        yield from payload.get("experiments", [])
+
+        page_token = payload.get("next_page_token")
+        if not page_token:
+            break
+
+def get_latest_run(experiment_id, since=None, deadline=None):
+    """
+    Returns the most recently finished run of an experiment, or None if it has no runs.
+    If since is given (epoch millis), only runs that ended after it are considered.
+    """
     body = {
-        "experiment_ids": experiment_ids
+        "experiment_ids": [experiment_id],
+        "order_by": ["attributes.end_time DESC"],
+        "max_results": 1
     }
-    runs_response = requests.post(runs_url, json=body)
+    if since is not None:
+        body["filter"] = f"attributes.end_time > {since}"
+    runs_response = mlflow_request("POST", runs_url, deadline=deadline, json=body)
     if runs_response.status_code != 200:
         raise Exception(f"Failed to get runs: {runs_response.text}")
 
     runs = runs_response.json().get("runs", [])
+    return runs[0] if runs else None
+
+def get_metric_history(run_id, metric_key, deadline=None):
+    """
+    Returns every logged step of a metric, following next_page_token.
+    """
+    history = []
+    page_token = None
+    while True:
+        params = {"run_id": run_id, "metric_key": metric_key}
+        if page_token:
+            params["page_token"] = page_token
+
+        response = mlflow_request("GET", history_url, deadline=deadline, params=params)
+        if response.status_code != 200:
+            raise Exception(f"Failed to get metric history: {response.text}")
+
+        payload = response.json()
+        history.extend(payload.get("metrics", []))
+
+        page_token = payload.get("next_page_token")
+        if not page_token:
+            return history
+
+def escape_label_value(value):
+    """
+    Escapes a label value for the Prometheus text format.
+    """
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def build_label_string(exp, run):
+    """
+    Builds the pre-escaped label block shared by every series of a run, following SERIES_LABELS.
+    """
+    tags = {tag["key"]: tag["value"] for tag in run.get("data", {}).get("tags", [])}
+    values = {
+        "experiment": exp["name"],
+        "model_type": tags.get("model_type", ""),
+        "run_name": run["info"].get("run_name") or tags.get("mlflow.runName", "")
+    }
+    return ",".join(f'{label}="{escape_label_value(values[label])}"' for label in SERIES_LABELS)
+
+@lru_cache(maxsize=None)
+def metric_name(key):
+    """
+    Maps an MLflow metric key to a valid Prometheus metric name.
+    """
+    return "mlflow_" + re.sub(r"[^a-zA-Z0-9_:]", "_", key)
+
+def refresh_latest_run(exp, deadline=None):
+    """
+    Returns the cache entry with the latest run of an experiment, asking
+    MLflow only for runs newer than the cached watermark and merging the
+    answer into the cache.
+    """
+    experiment_id = exp["experiment_id"]
+    cached = _latest_runs.get(experiment_id)
+    since = int(cached["run"]["info"].get("end_time") or 0) if cached else None
 
-    latest_runs = {}
-    for run in runs:
-        info = run["info"]
-        exp_id = info["experiment_id"]
-        end_time = int(info.get("end_time", 0))
+    run = get_latest_run(experiment_id, since=since, deadline=deadline)
+    count_stat("experiments_scanned")
+    if run is None:
+        return cached
+    count_stat("runs_scanned")
 
-        if exp_id not in latest_runs or end_time > int(latest_runs[exp_id]["info"].get("end_time", 0)):
-            latest_runs[exp_id] = run
+    history = {}
+    if EXPORT_METRIC_HISTORY:
+        for metric in run.get("data", {}).get("metrics", []):
+            history[metric["key"]] = get_metric_history(run["info"]["run_id"], metric["key"], deadline)
 
-    prometheus_metrics = []
-    for exp_id, run in latest_runs.items():
-        run_id = run["info"]["run_id"]
-        metrics = run.get("data", {}).get("metrics", [])
-        for metric in metrics:
-            key = metric["key"]
-            value = metric["value"]
-            line = f'mlflow_{key}{{run_id="{run_id}"}} {value}'
-            prometheus_metrics.append(line)
+    entry = {"run": run, "labels": build_label_string(exp, run), "history": history}
+    _latest_runs[experiment_id] = entry
+    return entry
 
-    response_body = "\n".join(prometheus_metrics)
+def iter_latest_runs(experiments, deadline=None):
+    """
+    Fetches the latest run of every experiment concurrently (at most
+    FETCH_CONCURRENCY requests in flight) and yields (experiment, entry) pairs
+    in experiment order. An experiment whose request fails, or that is still
+    queued when the scrape deadline passes, is skipped so the rest of the
+    scrape is still served.
+    """
+    if not experiments:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(FETCH_CONCURRENCY, len(experiments))) as executor:
+        futures = [executor.submit(refresh_latest_run, exp, deadline) for exp in experiments]
+        for exp, future in zip(experiments, futures):
+            try:
+                entry = future.result()
+            except Exception as e:
+                print(f"Skipping experiment {exp['name']}: {e}")
+                continue
+            if entry is not None:
+                yield exp, entry
+
+def iter_prometheus_lines(experiments, deadline=None):
+    """
+    Yields the Prometheus exposition for the latest run of each experiment.
+    Samples are grouped per metric family under its # HELP / # TYPE headers.
+    """
+    families = {}
+    for exp, entry in iter_latest_runs(experiments, deadline):
+        labels = entry["labels"]
+        for metric in entry["run"].get("data", {}).get("metrics", []):
+            name = metric_name(metric["key"])
+            family = families.setdefault(name, {"help": f"MLflow metric '{metric['key']}'", "samples": []})
+            family["samples"].append(name + "{" + labels + "} " + str(metric["value"]))
+
+        for key, points in entry["history"].items():
+            name = metric_name(key) + "_history"
+            family = families.setdefault(name, {"help": f"Step history of MLflow metric '{key}'", "samples": []})
+            for point in points:
+                family["samples"].append(
+                    name + "{" + labels + ',step="' + str(point.get("step", 0)) + '"} '
+                    + str(point["value"]) + " " + str(point["timestamp"])
+                )
+
+    for name, family in families.items():
+        yield f"# HELP {name} {family['help']} for the latest run of each experiment."
+        yield f"# TYPE {name} gauge"
+        yield from family["samples"]
+
+def build_metrics_body(deadline=None):
+    """
+    Builds the Prometheus exposition body from the MLflow API within the
+    scrape deadline (by default SCRAPE_TIMEOUT_SECONDS from now).
+    """
+    if deadline is None:
+        deadline = get_scrape_deadline()
+    experiments = list(iter_experiments(deadline))
+    if not experiments:
+        raise Exception("No experiments found.")
+
+    experiments = [exp for exp in experiments if exp['name'] != "Default"]
+
+    # Forget experiments that no longer exist
+    experiment_ids = {exp["experiment_id"] for exp in experiments}
+    for experiment_id in list(_latest_runs):
+        if experiment_id not in experiment_ids:
+            del _latest_runs[experiment_id]
+
+    lines = list(iter_prometheus_lines(experiments, deadline))
+    with _stats_lock:
+        _exporter_stats["series_emitted"] = sum(1 for line in lines if not line.startswith("#"))
+
+    return "\n".join(lines)
+
+def iter_exporter_lines(scrape_duration, cold_start):
+    """
+    Yields the exporter's own series: handler duration, upstream latency
+    histograms, scan counters, series emitted, cache hit ratio and cold start.
+    """
+    with _stats_lock:
+        stats = dict(_exporter_stats)
+        latency = {endpoint: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                   for endpoint, h in _upstream_latency.items()}
+
+    yield "# HELP mlflow_exporter_scrape_duration_seconds Time spent in the handler for this scrape."
+    yield "# TYPE mlflow_exporter_scrape_duration_seconds gauge"
+    yield f"mlflow_exporter_scrape_duration_seconds {scrape_duration}"
+
+    yield "# HELP mlflow_exporter_upstream_request_duration_seconds Latency of the calls to the MLflow server."
+    yield "# TYPE mlflow_exporter_upstream_request_duration_seconds histogram"
+    for endpoint, histogram in latency.items():
+        label = 'endpoint="' + escape_label_value(endpoint) + '"'
+        for bound, count in zip(UPSTREAM_LATENCY_BUCKETS, histogram["buckets"]):
+            yield f'mlflow_exporter_upstream_request_duration_seconds_bucket{{{label},le="{bound}"}} {count}'
+        yield f'mlflow_exporter_upstream_request_duration_seconds_bucket{{{label},le="+Inf"}} {histogram["count"]}'
+        yield f'mlflow_exporter_upstream_request_duration_seconds_sum{{{label}}} {histogram["sum"]}'
+        yield f'mlflow_exporter_upstream_request_duration_seconds_count{{{label}}} {histogram["count"]}'
+
+    yield "# HELP mlflow_exporter_experiments_scanned_total Experiments queried for new runs."
+    yield "# TYPE mlflow_exporter_experiments_scanned_total counter"
+    yield f"mlflow_exporter_experiments_scanned_total {stats['experiments_scanned']}"
+
+    yield "# HELP mlflow_exporter_runs_scanned_total New runs returned by the MLflow server."
+    yield "# TYPE mlflow_exporter_runs_scanned_total counter"
+    yield f"mlflow_exporter_runs_scanned_total {stats['runs_scanned']}"
+
+    yield "# HELP mlflow_exporter_series_emitted Model metric samples in the last built body."
+    yield "# TYPE mlflow_exporter_series_emitted gauge"
+    yield f"mlflow_exporter_series_emitted {stats['series_emitted']}"
+
+    hit_ratio = stats["cache_hits"] / stats["scrapes"] if stats["scrapes"] else 0.0
+    yield "# HELP mlflow_exporter_cache_hit_ratio Share of scrapes served from the response cache (fresh or stale)."
+    yield "# TYPE mlflow_exporter_cache_hit_ratio gauge"
+    yield f"mlflow_exporter_cache_hit_ratio {hit_ratio}"
+
+    yield "# HELP mlflow_exporter_cold_start Whether this scrape was the first one of the Lambda container."
+    yield "# TYPE mlflow_exporter_cold_start gauge"
+    yield f"mlflow_exporter_cold_start {1 if cold_start else 0}"
+
+def _store_body(body):
+    """
+    Saves a freshly built body in the module cache together with its ETag.
+    The ETag is weak: it only covers the model series, while the response
+    also carries mlflow_exporter_* lines that change on every scrape.
+    """
+    etag = 'W/"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+    with _cache_lock:
+        _cache["body"] = body
+        _cache["etag"] = etag
+        _cache["fetched_at"] = time.time()
+    return body, etag
+
+def _refresh_in_background():
+    """
+    Rebuilds the cached body. Errors keep the stale body in place.
+    Lambda freezes the container once the response is returned, so a refresh
+    that does not finish in time simply resumes on the next warm invocation.
+    """
+    try:
+        _store_body(build_metrics_body())
+    except Exception as e:
+        print(f"Background refresh failed: {e}")
+    finally:
+        _refresh_running.clear()
+
+def get_metrics_body(deadline=None):
+    """
+    Returns (body, etag, cache_status) where cache_status is "hit", "stale" or "miss".
+    """
+    with _cache_lock:
+        body, etag, fetched_at = _cache["body"], _cache["etag"], _cache["fetched_at"]
+    age = time.time() - fetched_at
+
+    if body is not None and age < CACHE_TTL_SECONDS:
+        return body, etag, "hit"
+
+    if body is not None and age < CACHE_TTL_SECONDS + CACHE_STALE_SECONDS:
+        with _cache_lock:
+            start_refresh = not _refresh_running.is_set()
+            _refresh_running.set()
+        if start_refresh:
+            threading.Thread(target=_refresh_in_background, daemon=True).start()
+        return body, etag, "stale"
+
+    body, etag = _store_body(build_metrics_body(deadline))
+    return body, etag, "miss"
+
+def etag_matches(if_none_match, etag):
+    """
+    Weak comparison of an If-None-Match header (a list of ETags or "*") against an ETag.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def metrics_handler(event, context):
+    """
+    This handler takes the data from the MLflow API and returns data in Prometheus format.
+    """
+    global _cold_start
+    start = time.perf_counter()
+    cold_start, _cold_start = _cold_start, False
+
+    response_body, etag, cache_status = get_metrics_body(get_scrape_deadline(context))
+
+    count_stat("scrapes")
+    if cache_status != "miss":
+        count_stat("cache_hits")
+
+    headers = {
+        "Content-Type": "text/plain",
+        "ETag": etag,
+        # The exporter series change on every scrape: clients must revalidate
+        "Cache-Control": "no-cache",
+        "X-Cache": cache_status
+    }
+
+    request_headers = {k.lower(): v for k, v in ((event or {}).get("headers") or {}).items()}
+    if etag_matches(request_headers.get("if-none-match"), etag):
+        return {
+            "statusCode": 304,
+            "headers": headers,
+            "body": ""
+        }
+
+    exporter_lines = iter_exporter_lines(time.perf_counter() - start, cold_start)
+    response_body = "\n".join([response_body, *exporter_lines])
 
     return {
         "statusCode": 200,
-        "headers": {
-            "Content-Type": "text/plain"
-        },
+        "headers": headers,
         "body": response_body
-    }
\ No newline at end of file
+    }
@@ -183,6 +183,7 @@ module "lambda" {
     for k in each.value.env_vars : k => local.env_vars[k]
   }
   api_folder = var.api_folder
+  timeout    = var.lambda_timeout
 }
 
 #########################################
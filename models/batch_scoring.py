@@ -0,0 +1,234 @@
+import os
+import sys
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from serving import FEATURES, load_model_pair, predict_goals
+from worker_env import get_worker_limits, apply_worker_env
+
+# Columnas de salida: features de entrada y goles esperados
+OUTPUT_COLUMNS = FEATURES + ['goles_local', 'goles_visitante']
+
+# Formato de los floats en la salida CSV (convertir floats a texto domina el costo de escribir CSV)
+CSV_FLOAT_FORMAT = '%.6f'
+
+# Arrays .npy abiertos con mmap en este proceso, por ruta
+_npy_arrays = {}
+
+_worker_model_pair = None
+
+def open_npy(path):
+    """
+    Abre (una sola vez por proceso) un .npy de ratings con mmap
+    """
+    if path not in _npy_arrays:
+        array = np.load(path, mmap_mode='r')
+        if array.ndim != 2 or array.shape[1] != len(FEATURES):
+            raise ValueError(f"{path} debe tener forma (n, {len(FEATURES)}) con columnas {FEATURES}")
+        _npy_arrays[path] = array
+    return _npy_arrays[path]
+
+def iter_chunks(input_path, chunk_rows):
+    """
+    Genera los chunks de la entrada. Para .npy cada chunk es solo una
+    referencia (ruta, inicio, fin): los workers leen esas filas del mmap sin
+    que pasen por el proceso principal. Para CSV y Parquet el chunk es la
+    matriz de ratings ya leída.
+    """
+    extension = os.path.splitext(input_path)[1].lower()
+
+    if extension == '.npy':
+        n_rows = len(open_npy(input_path))
+        for start in range(0, n_rows, chunk_rows):
+            yield (input_path, start, min(start + chunk_rows, n_rows))
+
+    elif extension == '.csv':
+        for frame in pd.read_csv(input_path, usecols=FEATURES, chunksize=chunk_rows):
+            yield frame[FEATURES].to_numpy(dtype=np.float64)
+
+    elif extension == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            print("Para leer Parquet se necesita pyarrow: pip install pyarrow")
+            sys.exit(1)
+        for batch in pq.ParquetFile(input_path).iter_batches(batch_size=chunk_rows, columns=FEATURES):
+            yield np.column_stack([batch.column(feature).to_numpy(zero_copy_only=False) for feature in FEATURES]).astype(np.float64)
+
+    else:
+        raise ValueError(f"Formato de entrada no soportado: {extension} (usar .csv, .parquet o .npy)")
+
+def materialize(chunk):
+    """
+    Retorna la matriz de ratings de un chunk
+    """
+    if isinstance(chunk, tuple):
+        path, start, end = chunk
+        return np.asarray(open_npy(path)[start:end], dtype=np.float64)
+    return chunk
+
+def is_parquet(path):
+    """
+    Indica si la salida se escribe en Parquet (si no, en CSV)
+    """
+    return os.path.splitext(path)[1].lower() == '.parquet'
+
+def format_csv_chunk(X, predictions):
+    """
+    Convierte un chunk de resultados a texto CSV (sin encabezado)
+    """
+    frame = pd.DataFrame(np.column_stack([X, predictions]), columns=OUTPUT_COLUMNS)
+    return frame.to_csv(header=False, index=False, float_format=CSV_FLOAT_FORMAT)
+
+class ChunkWriter:
+    """
+    Escribe los resultados en CSV o Parquet a medida que llegan, en orden.
+    Para CSV, los workers ya entregan el texto formateado.
+    """
+
+    def __init__(self, output_path):
+        self._output_path = output_path
+        self._parquet = is_parquet(output_path)
+        self._writer = None
+        self._file = None
+        self.rows = 0
+
+        if self._parquet:
+            try:
+                import pyarrow
+                import pyarrow.parquet as pq
+            except ImportError:
+                print("Para escribir Parquet se necesita pyarrow: pip install pyarrow")
+                sys.exit(1)
+            self._pa, self._pq = pyarrow, pq
+        else:
+            self._file = open(output_path, 'w', encoding='utf-8', newline='')
+
+    def write(self, result):
+        """
+        Escribe un resultado de score_chunk: (filas, texto CSV) o (filas, matriz de salida)
+        """
+        rows, data = result
+        if self._parquet:
+            frame = pd.DataFrame(data, columns=OUTPUT_COLUMNS)
+            table = self._pa.Table.from_pandas(frame, preserve_index=False)
+            if self._writer is None:
+                self._writer = self._pq.ParquetWriter(self._output_path, table.schema)
+            self._writer.write_table(table)
+        else:
+            if self.rows == 0:
+                self._file.write(','.join(OUTPUT_COLUMNS) + '\n')
+            self._file.write(data)
+        self.rows += rows
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+def score_chunk(model_pair, chunk, csv_output=True):
+    """
+    Predice los goles esperados de un chunk. Retorna (filas, texto CSV) o,
+    para salida Parquet, (filas, matriz con ratings y goles esperados).
+    """
+    X = materialize(chunk)
+    y_local, y_visitante = predict_goals(model_pair, X)
+    predictions = np.column_stack([y_local, y_visitante])
+    if csv_output:
+        return len(X), format_csv_chunk(X, predictions)
+    return len(X), np.column_stack([X, predictions])
+
+def _init_worker(env, model_type, run_name, version):
+    """
+    Inicializa un worker: aplica el reparto de núcleos y carga los modelos
+    una única vez por proceso
+    """
+    global _worker_model_pair
+    apply_worker_env(env)
+    _worker_model_pair = load_model_pair(model_type, run_name, version)
+
+def _score_chunk_in_worker(chunk, csv_output):
+    return score_chunk(_worker_model_pair, chunk, csv_output)
+
+def score_file(input_path, output_path, model_type, run_name, version="latest", workers=1,
+               chunk_rows=100000, max_in_flight=None):
+    """
+    Puntúa todos los partidos de la entrada en chunks y escribe los
+    resultados a medida que se completan, en el orden de la entrada.
+
+    Con workers > 1 los chunks se reparten en un pool de procesos. Como
+    mucho max_in_flight chunks (por defecto 2 por worker) están leídos o
+    en proceso a la vez, por lo que la memoria depende del tamaño del chunk
+    y no del de la entrada. Retorna la cantidad de filas escritas.
+    """
+    csv_output = not is_parquet(output_path)
+    writer = ChunkWriter(output_path)
+    try:
+        if workers <= 1:
+            model_pair = load_model_pair(model_type, run_name, version)
+            for chunk in iter_chunks(input_path, chunk_rows):
+                writer.write(score_chunk(model_pair, chunk, csv_output))
+            return writer.rows
+
+        max_in_flight = max_in_flight or workers * 2
+        worker_env = get_worker_limits(workers)
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(worker_env, model_type, run_name, version)) as executor:
+            # Cola FIFO de chunks en vuelo: se escribe siempre el más antiguo
+            in_flight = deque()
+            for chunk in iter_chunks(input_path, chunk_rows):
+                if len(in_flight) >= max_in_flight:
+                    writer.write(in_flight.popleft().result())
+                in_flight.append(executor.submit(_score_chunk_in_worker, chunk, csv_output))
+
+            while in_flight:
+                writer.write(in_flight.popleft().result())
+        return writer.rows
+    finally:
+        writer.close()
+
+def parse_args():
+    """
+    Parsea los argumentos de línea de comandos
+    """
+    parser = argparse.ArgumentParser(description="Puntuación masiva de partidos con un par de modelos registrados")
+    parser.add_argument("input", help="Ratings de entrada (.csv, .parquet o .npy con columnas rating_local, rating_visitante)")
+    parser.add_argument("output", help="Archivo de salida (.csv o .parquet)")
+    parser.add_argument("--model-type", required=True,
+                        help="Tipo de modelo registrado (ej: RandomForestRegressor)")
+    parser.add_argument("--run-name", required=True,
+                        help="run_name de la configuración (ej: RF_config_01)")
+    parser.add_argument("--version", default="latest",
+                        help="Versión de los modelos registrados (default: latest)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos que puntúan chunks en paralelo (default: 1)")
+    parser.add_argument("--chunk-rows", type=int, default=100000,
+                        help="Filas por chunk (default: 100000)")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="Chunks leídos o en proceso a la vez (default: 2 por worker)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    print("PUNTUACIÓN MASIVA DE PARTIDOS")
+    print("=" * 50)
+    print(f"Entrada: {args.input} | Salida: {args.output}")
+    print(f"Modelos: {args.model_type} ({args.run_name}) | Workers: {args.workers} | "
+          f"Chunk: {args.chunk_rows} filas")
+
+    start_time = time.time()
+    rows = score_file(args.input, args.output, args.model_type, args.run_name, args.version,
+                      max(1, args.workers), args.chunk_rows, args.max_in_flight)
+    elapsed = time.time() - start_time
+
+    print(f"\n{rows} partidos puntuados en {elapsed:.2f} segundos "
+          f"({rows / elapsed if elapsed > 0 else 0:.0f} filas/s)")
+
+if __name__ == "__main__":
+    main()
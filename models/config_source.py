@@ -0,0 +1,142 @@
+import os
+import json
+
+# Modelos de ensamble que pueden crecer con warm_start=True
+WARM_START_MODELS = {"RandomForestRegressor", "GradientBoostingRegressor"}
+
+# Índice de offsets por manifest JSONL: (ruta, mtime) -> lista de offsets en bytes de cada línea
+_manifest_offsets = {}
+
+def parse_manifest_source(config_source):
+    """
+    Separa una referencia a una línea de un manifest en (ruta, separador,
+    número). Las referencias son manifest.jsonl#N (N-ésima configuración) o
+    manifest.jsonl@OFFSET (línea que empieza en ese byte). Retorna None si
+    la referencia es un archivo JSON.
+    """
+    for separator in ('@', '#'):
+        path, _, value = config_source.rpartition(separator)
+        if path.endswith('.jsonl') and value.isdigit():
+            return path, separator, int(value)
+    return None
+
+def is_manifest_source(config_source):
+    """
+    Indica si la referencia apunta a una línea de un manifest
+    """
+    return parse_manifest_source(config_source) is not None
+
+def _get_manifest_offsets(manifest_path):
+    """
+    Recorre el manifest una sola vez y memoriza el offset de cada línea, para
+    poder leer cualquier configuración con un seek
+    """
+    key = (os.path.abspath(manifest_path), os.stat(manifest_path).st_mtime_ns)
+    if key not in _manifest_offsets:
+        offsets = []
+        with open(manifest_path, 'rb') as f:
+            offset = 0
+            for line in f:
+                if line.strip():
+                    offsets.append(offset)
+                offset += len(line)
+        _manifest_offsets[key] = offsets
+    return _manifest_offsets[key]
+
+def load_config_source(config_source):
+    """
+    Carga una configuración desde un archivo JSON o desde una línea de un
+    manifest JSONL (manifest.jsonl#N, con N empezando en 0, o
+    manifest.jsonl@OFFSET). Con @OFFSET se lee la línea con un solo seek,
+    sin recorrer el manifest para indexarlo.
+    """
+    manifest_source = parse_manifest_source(config_source)
+    if manifest_source is None:
+        with open(config_source, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    manifest_path, separator, value = manifest_source
+    if separator == '@':
+        offset = value
+    else:
+        offsets = _get_manifest_offsets(manifest_path)
+        if value >= len(offsets):
+            raise FileNotFoundError(f"El manifest {manifest_path} tiene {len(offsets)} configuraciones")
+        offset = offsets[value]
+
+    with open(manifest_path, 'rb') as f:
+        f.seek(offset)
+        return json.loads(f.readline().decode('utf-8'))
+
+def iter_manifest_sources(manifest_path):
+    """
+    Genera las referencias (manifest.jsonl@OFFSET) de todas las configuraciones
+    de un manifest. Llevan el offset de la línea para que cada proceso que las
+    reciba (ej: predictor_from_json.py en un subproceso) lea su configuración
+    sin volver a recorrer el manifest.
+    """
+    for offset in _get_manifest_offsets(manifest_path):
+        yield f"{manifest_path}@{offset}"
+
+def get_family_key(config):
+    """
+    Clave de familia: todo lo que define el entrenamiento salvo n_estimators.
+    Retorna None si el modelo no admite warm start.
+    """
+    if config['model_type'] not in WARM_START_MODELS or 'n_estimators' not in config['parameters']:
+        return None
+    parameters = {name: value for name, value in config['parameters'].items()
+                  if name not in ('n_estimators', 'warm_start')}
+    return json.dumps({
+        'model_type': config['model_type'],
+        'experiment_name': config['experiment_name'],
+        'multi_output': config.get('multi_output', False),
+        'parameters': parameters,
+        'dataset': config['dataset'],
+        'training': config['training']
+    }, sort_keys=True)
+
+def group_config_families(config_sources):
+    """
+    Agrupa las configuraciones que solo difieren en n_estimators. Retorna una
+    lista de grupos (listas de referencias) en el orden de la primera aparición,
+    con cada familia ordenada por n_estimators ascendente. Las configuraciones
+    que no admiten warm start, o que no se pueden leer, quedan en grupos de uno.
+    """
+    families = {}
+    groups = []
+    for config_source in config_sources:
+        try:
+            config = load_config_source(config_source)
+            key = get_family_key(config)
+        except Exception:
+            key = None
+
+        if key is None:
+            groups.append([(config_source, None)])
+        elif key in families:
+            families[key].append((config_source, config['parameters']['n_estimators']))
+        else:
+            families[key] = [(config_source, config['parameters']['n_estimators'])]
+            groups.append(families[key])
+
+    return [[config_source for config_source, _ in sorted(group, key=lambda item: item[1] or 0)]
+            for group in groups]
+
+def write_manifest(configs, manifest_path):
+    """
+    Escribe las configuraciones en un manifest JSONL (una por línea) a medida
+    que se generan, sin materializar la lista completa. Retorna la cantidad escrita.
+    """
+    directory = os.path.dirname(manifest_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    count = 0
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        for config in configs:
+            f.write(json.dumps(config, ensure_ascii=False) + '\n')
+            count += 1
+    os.replace(tmp_path, manifest_path)
+    return count
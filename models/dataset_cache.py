@@ -0,0 +1,174 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+
+# Directorio donde se guardan los datasets ya parseados (.npy)
+CACHE_DIR = os.getenv("DATASET_CACHE_DIR", os.path.join(".cache", "datasets"))
+
+# Cache en memoria: se comparte entre todos los experimentos de un mismo proceso
+_memory_cache = {}
+_split_cache = {}
+
+def get_dataset_key(dataset_config):
+    """
+    Calcula la clave del dataset a partir de la ruta del archivo, su fecha de
+    modificación y la selección de columnas. Si el CSV cambia, cambia la clave.
+    """
+    file_path = os.path.abspath(dataset_config['file_path'])
+    stat = os.stat(file_path)
+    key_data = {
+        'file_path': file_path,
+        'mtime_ns': stat.st_mtime_ns,
+        'size': stat.st_size,
+        'features': list(dataset_config['features']),
+        'targets': list(dataset_config['targets'])
+    }
+    return hashlib.sha1(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _load_from_disk(key):
+    """
+    Carga las matrices de features y targets desde el cache en disco.
+    Los .npy se abren con mmap para no copiarlos hasta que se usan.
+    """
+    entry_dir = os.path.join(CACHE_DIR, key)
+    if not os.path.exists(os.path.join(entry_dir, 'meta.json')):
+        return None
+
+    X = np.load(os.path.join(entry_dir, 'X.npy'), mmap_mode='r')
+    y = np.load(os.path.join(entry_dir, 'y.npy'), mmap_mode='r')
+    return X, y
+
+def _save_to_disk(key, X, y, dataset_config):
+    """
+    Guarda las matrices en el cache en disco. Se escriben en un directorio
+    temporal y luego se renombra, para que otro proceso nunca lea una entrada
+    a medio escribir.
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    entry_dir = os.path.join(CACHE_DIR, key)
+    tmp_dir = tempfile.mkdtemp(dir=CACHE_DIR)
+    try:
+        np.save(os.path.join(tmp_dir, 'X.npy'), X)
+        np.save(os.path.join(tmp_dir, 'y.npy'), y)
+        meta = {
+            'file_path': dataset_config['file_path'],
+            'features': list(dataset_config['features']),
+            'targets': list(dataset_config['targets']),
+            'rows': int(X.shape[0])
+        }
+        with open(os.path.join(tmp_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_dir, entry_dir)
+    except OSError:
+        # Otro proceso ya escribió la misma entrada
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+def load_dataset(dataset_config):
+    """
+    Carga features y targets del dataset usando el cache.
+
+    Retorna (X, y_local, y_visitante) con los mismos nombres de columnas que
+    se obtendrían leyendo el CSV con pandas. El CSV solo se parsea la primera
+    vez para cada versión del archivo.
+    """
+    key = get_dataset_key(dataset_config)
+
+    if key in _memory_cache:
+        print(f"Dataset cargado: {dataset_config['file_path']} (cache en memoria)")
+        return _memory_cache[key]
+
+    arrays = _load_from_disk(key)
+    if arrays is not None:
+        source = "cache en disco"
+    else:
+        df = pd.read_csv(dataset_config['file_path'])
+        arrays = (df[dataset_config['features']].to_numpy(), df[dataset_config['targets']].to_numpy())
+        _save_to_disk(key, arrays[0], arrays[1], dataset_config)
+        source = "CSV"
+
+    X_values, y_values = arrays
+    features = dataset_config['features']
+    targets = dataset_config['targets']
+
+    X = pd.DataFrame(X_values, columns=features, copy=False)
+    y_local = pd.Series(y_values[:, 0], name=targets[0], copy=False)  # goles_local
+    y_visitante = pd.Series(y_values[:, 1], name=targets[1], copy=False)  # goles_visitante
+
+    _memory_cache[key] = (X, y_local, y_visitante)
+    print(f"Dataset cargado: {dataset_config['file_path']} ({len(X)} filas, {source})")
+    return _memory_cache[key]
+
+def get_split_key(dataset_config, training_config):
+    """
+    Calcula la clave del split: mismo dataset y mismo bloque 'training'
+    producen siempre la misma partición
+    """
+    key_data = {
+        'dataset': get_dataset_key(dataset_config),
+        'training': training_config
+    }
+    return hashlib.sha1(json.dumps(key_data, sort_keys=True).encode('utf-8')).hexdigest()
+
+def load_split_indices(dataset_config, training_config, n_rows):
+    """
+    Retorna los índices (train_idx, test_idx) del split. Se calculan una sola
+    vez con train_test_split sobre las posiciones de las filas y se guardan
+    como .npy; los demás procesos los leen con mmap sin copiarlos.
+    """
+    split_key = get_split_key(dataset_config, training_config)
+    entry_dir = os.path.join(CACHE_DIR, get_dataset_key(dataset_config))
+    train_path = os.path.join(entry_dir, f'split_{split_key}_train.npy')
+    test_path = os.path.join(entry_dir, f'split_{split_key}_test.npy')
+
+    if os.path.exists(train_path) and os.path.exists(test_path):
+        return np.load(train_path, mmap_mode='r'), np.load(test_path, mmap_mode='r')
+
+    train_idx, test_idx = train_test_split(
+        np.arange(n_rows),
+        test_size=training_config['test_size'],
+        random_state=training_config['random_state']
+    )
+
+    os.makedirs(entry_dir, exist_ok=True)
+    for path, indices in ((train_path, train_idx), (test_path, test_idx)):
+        fd, tmp_path = tempfile.mkstemp(dir=entry_dir, suffix='.npy')
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, indices)
+        os.replace(tmp_path, path)
+
+    return train_idx, test_idx
+
+def load_train_test_split(dataset_config, training_config):
+    """
+    Retorna el split de entrenamiento y test con el mismo orden que
+    train_test_split(X, y_local, y_visitante):
+    (X_train, X_test, y_train_local, y_test_local, y_train_visitante, y_test_visitante)
+
+    Las particiones se memorizan en el proceso, por lo que todos los
+    experimentos con el mismo 'dataset' y 'training' comparten los mismos frames.
+    """
+    split_key = get_split_key(dataset_config, training_config)
+    if split_key in _split_cache:
+        return _split_cache[split_key]
+
+    X, y_local, y_visitante = load_dataset(dataset_config)
+    train_idx, test_idx = load_split_indices(dataset_config, training_config, len(X))
+
+    _split_cache[split_key] = (
+        X.iloc[train_idx], X.iloc[test_idx],
+        y_local.iloc[train_idx], y_local.iloc[test_idx],
+        y_visitante.iloc[train_idx], y_visitante.iloc[test_idx]
+    )
+    return _split_cache[split_key]
+
+def clear_memory_cache():
+    """
+    Libera los datasets y splits cacheados en memoria
+    """
+    _memory_cache.clear()
+    _split_cache.clear()
@@ -1,7 +1,68 @@
 import json
 import os
-from itertools import product
+import argparse
+from itertools import product, chain
 from datetime import datetime
+from config_source import write_manifest
+
+# Grillas completas de hiperparámetros (usadas con --grid)
+RANDOM_FOREST_GRID = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [5, 10, 15, None],
+    "min_samples_split": [2, 5],
+    "min_samples_leaf": [1, 3]
+}
+
+GRADIENT_BOOSTING_GRID = {
+    "n_estimators": [50, 100, 150, 200],
+    "learning_rate": [0.05, 0.1, 0.15, 0.2],
+    "max_depth": [3, 4, 5, 7],
+    "subsample": [0.8, 0.85, 0.9, 1.0]
+}
+
+# Combinaciones seleccionadas (no todas para evitar explosión combinatoria)
+RANDOM_FOREST_SELECTED = [
+    (50, 5, 2, 1),
+    (50, 10, 2, 1),
+    (100, 5, 2, 1),
+    (100, 10, 2, 1),
+    (100, 15, 2, 1),
+    (100, None, 2, 1),
+    (200, 10, 2, 1),
+    (100, 10, 5, 1),
+    (100, 10, 2, 3),
+    (200, 15, 5, 3),
+]
+
+GRADIENT_BOOSTING_SELECTED = [
+    (50, 0.05, 3, 1.0),
+    (50, 0.1, 3, 1.0),
+    (50, 0.2, 3, 1.0),
+    (100, 0.05, 3, 1.0),
+    (100, 0.1, 3, 1.0),
+    (100, 0.2, 3, 1.0),
+    (200, 0.1, 3, 1.0),
+    (100, 0.1, 5, 1.0),
+    (100, 0.1, 7, 1.0),
+    (100, 0.1, 3, 0.8),
+    (100, 0.1, 3, 0.9),
+    (150, 0.15, 4, 0.85),
+]
+
+# LinearRegression tiene pocos parámetros, pero podemos crear variaciones
+LINEAR_REGRESSION_VARIATIONS = [
+    {"fit_intercept": True, "positive": False},
+    {"fit_intercept": False, "positive": False},
+    {"fit_intercept": True, "positive": True},
+]
+
+# Variaciones de parámetros para Poisson
+POISSON_REGRESSOR_VARIATIONS = [
+    {"alpha": 1.0, "solver": "lbfgs", "max_iter": 1000},
+    {"alpha": 0.5, "solver": "lbfgs", "max_iter": 1000},
+    {"alpha": 2.0, "solver": "lbfgs", "max_iter": 1000},
+    {"alpha": 1.0, "solver": "newton-cholesky", "max_iter": 1000},
+]
 
 def ensure_configs_dir():
     """
@@ -11,107 +72,75 @@ def ensure_configs_dir():
         os.makedirs('configs')
         print("Directorio 'configs/' creado")
 
-def generate_random_forest_configs():
+def build_config(model_type, run_name, experiment_name, parameters):
     """
-    Genera múltiples configuraciones JSON para RandomForest
+    Arma una configuración con el bloque común de dataset, entrenamiento y tags
     """
-    print("Generando configuraciones para RandomForest...")
-    
-    # Definir variaciones de parámetros
-    n_estimators_options = [50, 100, 200]
-    max_depth_options = [5, 10, 15, None]
-    min_samples_split_options = [2, 5]
-    min_samples_leaf_options = [1, 3]
-    
-    configs = []
-    config_counter = 1
-    
-    # Generar algunas combinaciones (no todas para evitar explosión combinatoria)
-    selected_combinations = [
-        (50, 5, 2, 1),
-        (50, 10, 2, 1),
-        (100, 5, 2, 1),
-        (100, 10, 2, 1),
-        (100, 15, 2, 1),
-        (100, None, 2, 1),
-        (200, 10, 2, 1),
-        (100, 10, 5, 1),
-        (100, 10, 2, 3),
-        (200, 15, 5, 3),
-    ]
+    return {
+        "model_type": model_type,
+        "run_name": run_name,
+        "experiment_name": experiment_name,
+        "parameters": parameters,
+        "dataset": {
+            "file_path": "dataset_futbol_simulado.csv",
+            "features": ["rating_local", "rating_visitante"],
+            "targets": ["goles_local", "goles_visitante"]
+        },
+        "training": {
+            "test_size": 0.2,
+            "random_state": 42
+        },
+        "tags": {
+            "model_version": "json_config",
+            "dataset": "futbol_simulado",
+            "experiment_type": "json_hyperparameter_tuning",
+            "generated_at": datetime.now().strftime('%Y-%m-%d_%H:%M:%S')
+        }
+    }
+
+def iter_grid(grid):
+    """
+    Genera perezosamente el producto cartesiano de una grilla {parámetro: opciones}
+    """
+    names = list(grid)
+    for values in product(*(grid[name] for name in names)):
+        yield values
+
+def iter_random_forest_configs(full_grid=False):
+    """
+    Genera las configuraciones de RandomForest de a una, sin materializar la lista
+    """
+    combinations = iter_grid(RANDOM_FOREST_GRID) if full_grid else RANDOM_FOREST_SELECTED
+    prefix = "RF_grid" if full_grid else "RF_config"
     
-    for n_est, max_d, min_split, min_leaf in selected_combinations:
-        config = {
-            "model_type": "RandomForestRegressor",
-            "run_name": f"RF_config_{config_counter:02d}",
-            "experiment_name": "RandomForestRegressor_JSON_Futbol",
-            "parameters": {
+    for config_counter, (n_est, max_d, min_split, min_leaf) in enumerate(combinations, 1):
+        yield build_config(
+            "RandomForestRegressor",
+            f"{prefix}_{config_counter:02d}",
+            "RandomForestRegressor_JSON_Futbol",
+            {
                 "n_estimators": n_est,
                 "max_depth": max_d,
                 "min_samples_split": min_split,
                 "min_samples_leaf": min_leaf,
                 "random_state": 42,
                 "n_jobs": -1
-            },
-            "dataset": {
-                "file_path": "dataset_futbol_simulado.csv",
-                "features": ["rating_local", "rating_visitante"],
-                "targets": ["goles_local", "goles_visitante"]
-            },
-            "training": {
-                "test_size": 0.2,
-                "random_state": 42
-            },
-            "tags": {
-                "model_version": "json_config",
-                "dataset": "futbol_simulado",
-                "experiment_type": "json_hyperparameter_tuning",
-                "generated_at": datetime.now().strftime('%Y-%m-%d_%H:%M:%S')
             }
-        }
-        
-        filename = f"configs/random_forest_config_{config_counter:02d}.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4, ensure_ascii=False)
-        
-        configs.append(filename)
-        config_counter += 1
-        
-        print(f"     Generado: {filename}")
-    
-    return configs
+        )
 
-def generate_gradient_boosting_configs():
+def iter_gradient_boosting_configs(full_grid=False):
     """
-    Genera múltiples configuraciones JSON para GradientBoosting
+    Genera las configuraciones de GradientBoosting de a una, sin materializar la lista
     """
-    print("Generando configuraciones para GradientBoosting...")
-    
-    # Definir variaciones de parámetros  
-    selected_combinations = [
-        (50, 0.05, 3, 1.0),
-        (50, 0.1, 3, 1.0),
-        (50, 0.2, 3, 1.0),
-        (100, 0.05, 3, 1.0),
-        (100, 0.1, 3, 1.0),
-        (100, 0.2, 3, 1.0),
-        (200, 0.1, 3, 1.0),
-        (100, 0.1, 5, 1.0),
-        (100, 0.1, 7, 1.0),
-        (100, 0.1, 3, 0.8),
-        (100, 0.1, 3, 0.9),
-        (150, 0.15, 4, 0.85),
-    ]
+    combinations = iter_grid(GRADIENT_BOOSTING_GRID) if full_grid else GRADIENT_BOOSTING_SELECTED
+    prefix = "GB_grid" if full_grid else "GB_config"
     
-    configs = []
-    config_counter = 1
-    
-    for n_est, lr, max_d, subsample in selected_combinations:
-        config = {
-            "model_type": "GradientBoostingRegressor",
-            "run_name": f"GB_config_{config_counter:02d}",
-            "experiment_name": "GradientBoostingRegressor_JSON_Futbol",
-            "parameters": {
+    for config_counter, (n_est, lr, max_d, subsample) in enumerate(combinations, 1):
+        yield build_config(
+            "GradientBoostingRegressor",
+            f"{prefix}_{config_counter:02d}",
+            "GradientBoostingRegressor_JSON_Futbol",
+            {
                 "n_estimators": n_est,
                 "learning_rate": lr,
                 "max_depth": max_d,
@@ -119,147 +148,120 @@ def generate_gradient_boosting_configs():
                 "min_samples_leaf": 1,
                 "subsample": subsample,
                 "random_state": 42
-            },
-            "dataset": {
-                "file_path": "dataset_futbol_simulado.csv",
-                "features": ["rating_local", "rating_visitante"],
-                "targets": ["goles_local", "goles_visitante"]
-            },
-            "training": {
-                "test_size": 0.2,
-                "random_state": 42
-            },
-            "tags": {
-                "model_version": "json_config",
-                "dataset": "futbol_simulado",
-                "experiment_type": "json_hyperparameter_tuning",
-                "generated_at": datetime.now().strftime('%Y-%m-%d_%H:%M:%S')
             }
-        }
-        
-        filename = f"configs/gradient_boosting_config_{config_counter:02d}.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4, ensure_ascii=False)
-        
-        configs.append(filename)
-        config_counter += 1
-        
-        print(f"     Generado: {filename}")
-    
-    return configs
+        )
 
-def generate_linear_regression_configs():
+def iter_linear_regression_configs(full_grid=False):
     """
-    Genera configuraciones JSON para LinearRegression
+    Genera las configuraciones de LinearRegression
     """
-    print("Generando configuraciones para LinearRegression...")
-    
-    configs = []
-    config_counter = 1
-    
-    # LinearRegression tiene pocos parámetros, pero podemos crear variaciones
-    variations = [
-        {"fit_intercept": True, "positive": False},
-        {"fit_intercept": False, "positive": False},
-        {"fit_intercept": True, "positive": True},
-    ]
-    
-    for params in variations:
-        config = {
-            "model_type": "LinearRegression",
-            "run_name": f"LR_config_{config_counter:02d}",
-            "experiment_name": "LinearRegression_JSON_Futbol",
-            "parameters": {
+    for config_counter, params in enumerate(LINEAR_REGRESSION_VARIATIONS, 1):
+        yield build_config(
+            "LinearRegression",
+            f"LR_config_{config_counter:02d}",
+            "LinearRegression_JSON_Futbol",
+            {
                 **params,
                 "copy_X": True,
                 "n_jobs": None
-            },
-            "dataset": {
-                "file_path": "dataset_futbol_simulado.csv",
-                "features": ["rating_local", "rating_visitante"],
-                "targets": ["goles_local", "goles_visitante"]
-            },
-            "training": {
-                "test_size": 0.2,
-                "random_state": 42
-            },
-            "tags": {
-                "model_version": "json_config",
-                "dataset": "futbol_simulado",
-                "experiment_type": "json_hyperparameter_tuning",
-                "generated_at": datetime.now().strftime('%Y-%m-%d_%H:%M:%S')
             }
-        }
-        
-        filename = f"configs/linear_regression_config_{config_counter:02d}.json"
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(config, f, indent=4, ensure_ascii=False)
-        
-        configs.append(filename)
-        config_counter += 1
-        
-        print(f"     Generado: {filename}")
-    
-    return configs
+        )
 
-def generate_poisson_regression_configs():
+def iter_poisson_regression_configs(full_grid=False):
     """
-    Genera configuraciones JSON para PoissonRegressor
+    Genera las configuraciones de PoissonRegressor
     """
-    print("Generando configuraciones para PoissonRegressor...")
-    
-    configs = []
-    config_counter = 1
-    
-    # Variaciones de parámetros para Poisson
-    variations = [
-        {"alpha": 1.0, "solver": "lbfgs", "max_iter": 1000},
-        {"alpha": 0.5, "solver": "lbfgs", "max_iter": 1000},
-        {"alpha": 2.0, "solver": "lbfgs", "max_iter": 1000},
-        {"alpha": 1.0, "solver": "newton-cholesky", "max_iter": 1000},
-    ]
-    
-    for params in variations:
-        config = {
-            "model_type": "PoissonRegressor",
-            "run_name": f"PR_config_{config_counter:02d}",
-            "experiment_name": "PoissonRegressor_JSON_Futbol",
-            "parameters": {
+    for config_counter, params in enumerate(POISSON_REGRESSOR_VARIATIONS, 1):
+        yield build_config(
+            "PoissonRegressor",
+            f"PR_config_{config_counter:02d}",
+            "PoissonRegressor_JSON_Futbol",
+            {
                 **params,
                 "tol": 1e-4
-            },
-            "dataset": {
-                "file_path": "dataset_futbol_simulado.csv",
-                "features": ["rating_local", "rating_visitante"],
-                "targets": ["goles_local", "goles_visitante"]
-            },
-            "training": {
-                "test_size": 0.2,
-                "random_state": 42
-            },
-            "tags": {
-                "model_version": "json_config",
-                "dataset": "futbol_simulado",
-                "experiment_type": "json_hyperparameter_tuning",
-                "generated_at": datetime.now().strftime('%Y-%m-%d_%H:%M:%S')
             }
-        }
-        
-        filename = f"configs/poisson_regressor_config_{config_counter:02d}.json"
+        )
+
+def iter_all_configs(full_grid=False):
+    """
+    Encadena los generadores de todos los modelos
+    """
+    return chain(
+        iter_random_forest_configs(full_grid),
+        iter_gradient_boosting_configs(full_grid),
+        iter_linear_regression_configs(full_grid),
+        iter_poisson_regression_configs(full_grid)
+    )
+
+def write_config_files(configs, file_prefix):
+    """
+    Escribe un archivo JSON por configuración en configs/
+    """
+    filenames = []
+    for config_counter, config in enumerate(configs, 1):
+        filename = f"configs/{file_prefix}_config_{config_counter:02d}.json"
         with open(filename, 'w', encoding='utf-8') as f:
             json.dump(config, f, indent=4, ensure_ascii=False)
         
-        configs.append(filename)
-        config_counter += 1
-        
+        filenames.append(filename)
         print(f"     Generado: {filename}")
     
-    return configs
+    return filenames
+
+def generate_random_forest_configs():
+    """
+    Genera múltiples configuraciones JSON para RandomForest
+    """
+    print("Generando configuraciones para RandomForest...")
+    return write_config_files(iter_random_forest_configs(), "random_forest")
+
+def generate_gradient_boosting_configs():
+    """
+    Genera múltiples configuraciones JSON para GradientBoosting
+    """
+    print("Generando configuraciones para GradientBoosting...")
+    return write_config_files(iter_gradient_boosting_configs(), "gradient_boosting")
+
+def generate_linear_regression_configs():
+    """
+    Genera configuraciones JSON para LinearRegression
+    """
+    print("Generando configuraciones para LinearRegression...")
+    return write_config_files(iter_linear_regression_configs(), "linear_regression")
+
+def generate_poisson_regression_configs():
+    """
+    Genera configuraciones JSON para PoissonRegressor
+    """
+    print("Generando configuraciones para PoissonRegressor...")
+    return write_config_files(iter_poisson_regression_configs(), "poisson_regressor")
+
+def parse_args():
+    """
+    Parsea los argumentos de línea de comandos
+    """
+    parser = argparse.ArgumentParser(description="Generador de configuraciones JSON")
+    parser.add_argument("--grid", action="store_true",
+                        help="Genera la grilla completa de hiperparámetros en lugar de las combinaciones seleccionadas")
+    parser.add_argument("--manifest",
+                        help="Escribe todas las configuraciones en un único manifest JSONL (ej: configs/manifest.jsonl)")
+    return parser.parse_args()
 
 def main():
+    args = parse_args()
+    
     print("GENERADOR DE CONFIGURACIONES JSON")
     print("=" * 50)
 
+    # Manifest JSONL: una configuración por línea, generadas de a una
+    if args.manifest or args.grid:
+        manifest_path = args.manifest or os.path.join('configs', 'manifest.jsonl')
+        total = write_manifest(iter_all_configs(full_grid=args.grid), manifest_path)
+        print(f"Manifest creado: {manifest_path} ({total} configuraciones)")
+        print(f"Ahora puedes ejecutar experimentos con:")
+        print(f"   python3 run_json_experiments.py --manifest {manifest_path} --all --in-process")
+        return
+
     # Asegurar que existe el directorio
     ensure_configs_dir()
     
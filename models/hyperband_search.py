@@ -0,0 +1,224 @@
+import io
+import sys
+import math
+import copy
+import time
+import random
+import argparse
+import contextlib
+import mlflow
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.tracking import MlflowClient
+from predictor_from_json import (tracking_uri, fit_models, predict_models, calculate_metrics,
+                                 train_and_evaluate_model)
+from dataset_cache import load_train_test_split
+from config_source import load_config_source, iter_manifest_sources
+from generate_json_configs import iter_all_configs
+
+# Modelos para los que el presupuesto puede ser la cantidad de árboles
+N_ESTIMATORS_MODELS = {"RandomForestRegressor", "GradientBoostingRegressor"}
+
+# Mínimo de filas de entrenamiento con presupuesto de datos
+MIN_TRAIN_ROWS = 50
+
+def get_budgets(min_budget, eta):
+    """
+    Retorna los presupuestos de cada escalón (fracción del total), de menor a
+    mayor, multiplicando por eta hasta llegar a 1.0
+    """
+    budgets = []
+    budget = min_budget
+    while budget < 1.0:
+        budgets.append(budget)
+        budget *= eta
+    budgets.append(1.0)
+    return budgets
+
+def load_search_data(config, validation_fraction):
+    """
+    Separa una porción de validación del conjunto de entrenamiento para
+    comparar candidatos sin usar el split de test. Como el split ya viene
+    mezclado, las últimas filas de entrenamiento son una muestra aleatoria.
+    """
+    X_train, _, y_train_local, _, y_train_visitante, _ = load_train_test_split(
+        config['dataset'], config['training']
+    )
+    n_fit = int(len(X_train) * (1 - validation_fraction))
+    return (
+        X_train.iloc[:n_fit], y_train_local.iloc[:n_fit], y_train_visitante.iloc[:n_fit],
+        X_train.iloc[n_fit:], y_train_local.iloc[n_fit:], y_train_visitante.iloc[n_fit:]
+    )
+
+def apply_budget(config, budget, budget_type):
+    """
+    Retorna una copia de la configuración con el presupuesto aplicado
+    """
+    config = copy.deepcopy(config)
+    if budget_type == "n_estimators":
+        full = config['parameters']['n_estimators']
+        config['parameters']['n_estimators'] = max(1, int(round(full * budget)))
+    return config
+
+def evaluate_candidate(config, budget, budget_type, data):
+    """
+    Entrena un candidato con el presupuesto indicado y retorna sus métricas de validación
+    """
+    X_fit, y_fit_local, y_fit_visitante, X_val, y_val_local, y_val_visitante = data
+    config = apply_budget(config, budget, budget_type)
+
+    if budget_type == "data":
+        n_rows = min(len(X_fit), max(MIN_TRAIN_ROWS, int(len(X_fit) * budget)))
+        X_fit, y_fit_local, y_fit_visitante = X_fit.iloc[:n_rows], y_fit_local.iloc[:n_rows], y_fit_visitante.iloc[:n_rows]
+
+    # fit_models imprime el progreso de cada entrenamiento; en la búsqueda se resume en una línea
+    with contextlib.redirect_stdout(io.StringIO()):
+        reg_local, reg_visitante = fit_models(config, X_fit, y_fit_local, y_fit_visitante)
+    y_pred_local, y_pred_visitante = predict_models(config, reg_local, reg_visitante, X_val)
+
+    return calculate_metrics(y_val_local, y_pred_local, y_val_visitante, y_pred_visitante)
+
+def log_rung_run(config, bracket, rung, budget, budget_type, metrics):
+    """
+    Registra la evaluación de un candidato como run anidado del run de la búsqueda
+    """
+    run_name = f"{config['run_name']}_b{bracket}_r{rung}"
+    with mlflow.start_run(run_name=run_name, nested=True) as run:
+        timestamp = int(time.time() * 1000)
+        params = [Param(name, str(value)) for name, value in apply_budget(config, budget, budget_type)['parameters'].items()]
+        params += [Param("budget", str(budget)), Param("budget_type", budget_type)]
+        tags = [RunTag("model_type", config['model_type']),
+                RunTag("candidate", config['run_name']),
+                RunTag("bracket", str(bracket)),
+                RunTag("rung", str(rung))]
+        MlflowClient().log_batch(
+            run.info.run_id,
+            metrics=[Metric(name, float(value), timestamp, rung) for name, value in metrics.items()],
+            params=params,
+            tags=tags
+        )
+
+def successive_halving(candidates, budgets, budget_type, eta, data, bracket=0):
+    """
+    Evalúa todos los candidatos con el menor presupuesto y promueve al
+    siguiente escalón solo la mejor fracción 1/eta según mse_promedio.
+    Retorna (mse_promedio, config) del mejor candidato del último escalón.
+    """
+    survivors = list(candidates)
+    for rung, budget in enumerate(budgets):
+        print(f"\n  Escalón {rung}: {len(survivors)} candidatos con presupuesto {budget:.3f} ({budget_type})")
+
+        results = []
+        for config in survivors:
+            start_time = time.time()
+            metrics = evaluate_candidate(config, budget, budget_type, data)
+            log_rung_run(config, bracket, rung, budget, budget_type, metrics)
+            results.append((metrics['mse_promedio'], config))
+            print(f"     {config['run_name']:20s} | MSE Promedio: {metrics['mse_promedio']:.4f} | "
+                  f"{time.time() - start_time:.2f} segundos")
+
+        results.sort(key=lambda result: result[0])
+        if rung < len(budgets) - 1:
+            survivors = [config for _, config in results[:max(1, len(results) // eta)]]
+
+    return results[0]
+
+def hyperband(candidates, budgets, budget_type, eta, data, seed=42):
+    """
+    Ejecuta varios brackets de successive halving, cada uno empezando con un
+    presupuesto mínimo distinto (más candidatos con poco presupuesto, o menos
+    candidatos con más presupuesto). Retorna el mejor resultado de todos.
+    """
+    rng = random.Random(seed)
+    s_max = len(budgets) - 1
+    best = None
+
+    for s in range(s_max, -1, -1):
+        n_candidates = min(len(candidates), int(math.ceil((s_max + 1) / (s + 1) * eta ** s)))
+        bracket_candidates = rng.sample(candidates, n_candidates)
+        print(f"\nBracket {s_max - s}: {n_candidates} candidatos, {s + 1} escalones")
+
+        result = successive_halving(bracket_candidates, budgets[s_max - s:], budget_type, eta, data,
+                                    bracket=s_max - s)
+        if best is None or result[0] < best[0]:
+            best = result
+
+    return best
+
+def load_candidates(model_type, manifest=None):
+    """
+    Obtiene los candidatos del manifest o de la grilla completa del generador
+    """
+    if manifest:
+        configs = (load_config_source(source) for source in iter_manifest_sources(manifest))
+    else:
+        configs = iter_all_configs(full_grid=True)
+    return [config for config in configs if config['model_type'] == model_type]
+
+def parse_args():
+    """
+    Parsea los argumentos de línea de comandos
+    """
+    parser = argparse.ArgumentParser(description="Búsqueda adaptativa de hiperparámetros (successive halving / Hyperband)")
+    parser.add_argument("--model-type", required=True,
+                        help="Tipo de modelo a optimizar (ej: RandomForestRegressor)")
+    parser.add_argument("--manifest",
+                        help="Manifest JSONL con los candidatos (default: grilla completa del generador)")
+    parser.add_argument("--budget", choices=["data", "n_estimators"], default="data",
+                        help="Recurso que crece entre escalones (default: data)")
+    parser.add_argument("--min-budget", type=float, default=1 / 9,
+                        help="Presupuesto del primer escalón como fracción del total (default: 1/9)")
+    parser.add_argument("--eta", type=int, default=3,
+                        help="Factor de reducción entre escalones (default: 3)")
+    parser.add_argument("--hyperband", action="store_true",
+                        help="Ejecuta todos los brackets de Hyperband en lugar de un solo successive halving")
+    parser.add_argument("--validation-fraction", type=float, default=0.2,
+                        help="Fracción del entrenamiento usada para comparar candidatos (default: 0.2)")
+    parser.add_argument("--register-best", action="store_true",
+                        help="Entrena y registra el mejor candidato con el pipeline completo")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    print("BÚSQUEDA ADAPTATIVA DE HIPERPARÁMETROS")
+    print("=" * 50)
+
+    if args.budget == "n_estimators" and args.model_type not in N_ESTIMATORS_MODELS:
+        print(f"El presupuesto n_estimators solo aplica a: {', '.join(sorted(N_ESTIMATORS_MODELS))}")
+        sys.exit(1)
+
+    candidates = load_candidates(args.model_type, args.manifest)
+    if not candidates:
+        print(f"No se encontraron candidatos para {args.model_type}")
+        sys.exit(1)
+
+    budgets = get_budgets(args.min_budget, args.eta)
+    data = load_search_data(candidates[0], args.validation_fraction)
+    print(f"Candidatos: {len(candidates)} | Escalones: {[round(b, 3) for b in budgets]}")
+
+    mlflow.set_tracking_uri(uri=tracking_uri)
+    mlflow.set_experiment(f"{candidates[0]['experiment_name']}_Search")
+
+    start_time = time.time()
+    search_name = "hyperband" if args.hyperband else "successive_halving"
+    with mlflow.start_run(run_name=f"{search_name}_{args.model_type}") as parent_run:
+        if args.hyperband:
+            best_mse, best_config = hyperband(candidates, budgets, args.budget, args.eta, data)
+        else:
+            best_mse, best_config = successive_halving(candidates, budgets, args.budget, args.eta, data)
+
+        mlflow.log_params({"search": search_name, "budget_type": args.budget, "eta": args.eta,
+                           "min_budget": args.min_budget, "candidates": len(candidates)})
+        mlflow.log_metric("best_mse_promedio", best_mse)
+        mlflow.set_tag("best_candidate", best_config['run_name'])
+
+    print("\n" + "=" * 50)
+    print(f"Mejor candidato: {best_config['run_name']} (MSE Promedio validación: {best_mse:.4f})")
+    print(f"Parámetros: {best_config['parameters']}")
+    print(f"Búsqueda completada en {time.time() - start_time:.2f} segundos (run {parent_run.info.run_id})")
+
+    if args.register_best:
+        train_and_evaluate_model(best_config)
+
+if __name__ == "__main__":
+    main()
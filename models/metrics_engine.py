@@ -0,0 +1,103 @@
+import numpy as np
+from outcome_probabilities import outcome_metrics
+
+# Rango máximo de etiquetas para usar una matriz de confusión densa indexada por
+# valor; si las predicciones se disparan se compactan las etiquetas con np.unique
+MAX_DENSE_LABELS = 1024
+
+def confusion_matrix(y_true, y_pred_rounded):
+    """
+    Construye la matriz de confusión (filas: valor real, columnas: valor
+    predicho) con un único np.bincount. Las etiquetas que no aparecen en
+    ninguno de los dos vectores quedan con fila y columna en cero, lo que no
+    afecta a las métricas ponderadas por soporte.
+    """
+    low = min(y_true.min(), y_pred_rounded.min())
+    high = max(y_true.max(), y_pred_rounded.max())
+    n_labels = int(high - low) + 1
+
+    if n_labels <= MAX_DENSE_LABELS:
+        true_codes = y_true - low
+        pred_codes = y_pred_rounded - low
+    else:
+        labels, codes = np.unique(np.concatenate([y_true, y_pred_rounded]), return_inverse=True)
+        n_labels = len(labels)
+        true_codes, pred_codes = codes[:len(y_true)], codes[len(y_true):]
+
+    counts = np.bincount(true_codes * n_labels + pred_codes, minlength=n_labels * n_labels)
+    return counts.reshape(n_labels, n_labels)
+
+def classification_metrics(y_true, y_pred_rounded):
+    """
+    Calcula accuracy y precision/recall/F1 ponderados por soporte a partir de
+    la matriz de confusión. Equivale a accuracy_score y a precision_score,
+    recall_score y f1_score con average='weighted' y zero_division=0.
+    """
+    cm = confusion_matrix(y_true, y_pred_rounded)
+    true_positives = np.diag(cm).astype(np.float64)
+    support = cm.sum(axis=1).astype(np.float64)
+    predicted = cm.sum(axis=0).astype(np.float64)
+    total = support.sum()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        precision = np.where(predicted > 0, true_positives / predicted, 0.0)
+        f1 = np.where(support + predicted > 0, 2 * true_positives / (support + predicted), 0.0)
+
+    accuracy = true_positives.sum() / total
+    return {
+        'accuracy': accuracy,
+        'precision': float(np.dot(precision, support) / total),
+        # El recall ponderado por soporte coincide con el accuracy
+        'recall': accuracy,
+        'f1': float(np.dot(f1, support) / total)
+    }
+
+def target_metrics(y_true, y_pred):
+    """
+    Calcula MSE y métricas de clasificación para un target, redondeando las
+    predicciones una sola vez
+    """
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+
+    mse = float(np.mean((y_true - y_pred) ** 2))
+    metrics = classification_metrics(y_true.astype(np.int64), np.rint(y_pred).astype(np.int64))
+    metrics['mse'] = mse
+    return metrics
+
+def calculate_metrics(y_test_local, y_pred_local, y_test_visitante, y_pred_visitante):
+    """
+    Calcula todas las métricas de evaluación con los mismos nombres que se
+    registran en MLflow
+    """
+    local = target_metrics(y_test_local, y_pred_local)
+    visitante = target_metrics(y_test_visitante, y_pred_visitante)
+
+    metrics = {}
+
+    # MSE
+    metrics['mse_local'] = local['mse']
+    metrics['mse_visitante'] = visitante['mse']
+    metrics['mse_promedio'] = (metrics['mse_local'] + metrics['mse_visitante']) / 2
+
+    # Accuracy
+    metrics['accuracy_local'] = float(local['accuracy'])
+    metrics['accuracy_visitante'] = float(visitante['accuracy'])
+    metrics['accuracy_promedio'] = (metrics['accuracy_local'] + metrics['accuracy_visitante']) / 2
+
+    # Precision
+    metrics['precision_local'] = local['precision']
+    metrics['precision_visitante'] = visitante['precision']
+
+    # Recall
+    metrics['recall_local'] = float(local['recall'])
+    metrics['recall_visitante'] = float(visitante['recall'])
+
+    # F1-score
+    metrics['f1_local'] = local['f1']
+    metrics['f1_visitante'] = visitante['f1']
+
+    # Probabilidades de resultado (local/empate/visitante) con goles Poisson
+    metrics.update(outcome_metrics(y_test_local, y_test_visitante, y_pred_local, y_pred_visitante))
+
+    return metrics
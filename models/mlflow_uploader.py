@@ -0,0 +1,55 @@
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+
+class MlflowUploader:
+    """
+    Cola de registro en MLflow en segundo plano.
+
+    El entrenamiento entrega el modelo y sus métricas con submit() y sigue con
+    el siguiente experimento; un número acotado de threads serializa, sube y
+    registra los modelos en el tracking server. max_pending limita cuántos
+    modelos entrenados pueden esperar en memoria: si la cola está llena,
+    submit() bloquea hasta que se libere un lugar.
+    """
+
+    def __init__(self, register_fn, max_workers=2, max_pending=4):
+        self._register_fn = register_fn
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mlflow-uploader")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._futures = []
+
+    def submit(self, run_name, *args, **kwargs):
+        """
+        Encola el registro de un experimento. Retorna el Future de la subida.
+        """
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._register_fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append((run_name, future))
+        return future
+
+    def pending(self):
+        """
+        Cantidad de registros encolados o en curso
+        """
+        return sum(1 for _, future in self._futures if not future.done())
+
+    def drain(self):
+        """
+        Espera a que termine toda la cola y cierra los threads.
+        Retorna una lista de (run_name, traceback) con los registros que fallaron.
+        """
+        wait([future for _, future in self._futures])
+        self._executor.shutdown(wait=True)
+
+        failures = []
+        for run_name, future in self._futures:
+            error = future.exception()
+            if error is not None:
+                failures.append((run_name, "".join(traceback.format_exception(type(error), error, error.__traceback__))))
+        return failures
@@ -0,0 +1,173 @@
+import os
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+import mlflow
+from mlflow.exceptions import MlflowException
+from mlflow.protos.databricks_pb2 import RESOURCE_DOES_NOT_EXIST
+from mlflow.tracking import MlflowClient
+
+# Memoria máxima por defecto para los modelos cacheados (tamaño serializado)
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Segundos durante los que se reutiliza la resolución de "latest" a un número
+# de versión; pasado ese tiempo se vuelve a consultar el registry
+LATEST_TTL_SECONDS = 30
+
+def resolve_version(name, version="latest"):
+    """
+    Retorna el número de versión concreto de un modelo registrado. "latest"
+    se resuelve a la versión más alta registrada.
+    """
+    if str(version) != "latest":
+        return str(version)
+    versions = MlflowClient().search_model_versions(f"name='{name}'")
+    if not versions:
+        raise MlflowException(f"Registered Model with name={name} not found", error_code=RESOURCE_DOES_NOT_EXIST)
+    return str(max(int(model_version.version) for model_version in versions))
+
+def get_model_size(model_path):
+    """
+    Tamaño en bytes del modelo descargado: el model.pkl del flavor sklearn
+    o, si no existe, la suma de los archivos del directorio
+    """
+    pickle_path = os.path.join(model_path, "model.pkl")
+    if os.path.exists(pickle_path):
+        return os.path.getsize(pickle_path)
+    return sum(os.path.getsize(os.path.join(root, file))
+               for root, _, files in os.walk(model_path) for file in files)
+
+def load_registered_model(name, version):
+    """
+    Descarga y carga una versión concreta de un modelo registrado en MLflow.
+    Retorna (modelo, tamaño en bytes del pickle descargado), para no tener
+    que volver a serializar el modelo para medirlo.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_path = mlflow.artifacts.download_artifacts(artifact_uri=f"models:/{name}/{version}", dst_path=tmp_dir)
+        return mlflow.sklearn.load_model(model_path), get_model_size(model_path)
+
+class ModelCache:
+    """
+    Cache LRU de modelos registrados, indexada por (nombre, número de versión).
+
+    La memoria se acota por el tamaño serializado de los modelos: al superar
+    max_bytes se descartan los menos usados recientemente. Si varios threads
+    piden el mismo modelo a la vez, se deserializa una sola vez. Con
+    preload() los modelos se cargan en segundo plano antes de necesitarlos.
+
+    "latest" se resuelve a un número de versión antes de buscar en la cache
+    (la resolución se reutiliza durante LATEST_TTL_SECONDS), por lo que una
+    versión registrada después se empieza a servir a lo sumo tras ese tiempo,
+    y un mismo modelo no se cachea dos veces como "latest" y como número.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, loader=load_registered_model, preload_threads=2,
+                 resolver=resolve_version, latest_ttl=LATEST_TTL_SECONDS):
+        self._max_bytes = max_bytes
+        self._loader = loader
+        self._resolver = resolver
+        self._latest_ttl = latest_ttl
+        self._lock = threading.Lock()
+        self._models = OrderedDict()
+        self._loading = {}
+        self._latest = {}
+        self._executor = ThreadPoolExecutor(max_workers=preload_threads, thread_name_prefix="model-preload")
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, name, version="latest"):
+        """
+        Retorna el modelo, cargándolo si no está en la cache
+        """
+        version = self._resolve(name, version)
+        key = (name, version)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self._hits += 1
+                return self._models[key][0]
+
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                self._misses += 1
+                future = Future()
+                self._loading[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            model, size = self._loader(name, version)
+        except BaseException as e:
+            with self._lock:
+                del self._loading[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._loading[key]
+            # Un modelo más grande que toda la cache se entrega sin cachear
+            if size <= self._max_bytes:
+                self._models[key] = (model, size)
+                self._bytes += size
+                self._evict()
+        future.set_result(model)
+        return model
+
+    def _resolve(self, name, version):
+        """
+        Número de versión concreto; "latest" se resuelve con el registry a lo
+        sumo una vez cada latest_ttl segundos por modelo
+        """
+        if str(version) != "latest":
+            return str(version)
+        with self._lock:
+            resolved = self._latest.get(name)
+        if resolved is not None and time.monotonic() - resolved[1] < self._latest_ttl:
+            return resolved[0]
+
+        version = self._resolver(name, "latest")
+        with self._lock:
+            self._latest[name] = (version, time.monotonic())
+        return version
+
+    def _evict(self):
+        while self._bytes > self._max_bytes:
+            _, (_, size) = self._models.popitem(last=False)
+            self._bytes -= size
+            self._evictions += 1
+
+    def preload(self, keys):
+        """
+        Carga en segundo plano los modelos indicados como (nombre, versión).
+        Retorna los Futures de cada carga.
+        """
+        return [self._executor.submit(self.get, name, version) for name, version in keys]
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._latest.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        Retorna los contadores de la cache
+        """
+        with self._lock:
+            requests = self._hits + self._misses
+            return {
+                'models': len(self._models),
+                'bytes': self._bytes,
+                'max_bytes': self._max_bytes,
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'hit_rate': self._hits / requests if requests else 0.0
+            }
@@ -0,0 +1,160 @@
+import time
+import argparse
+import numpy as np
+
+# Goles máximos por equipo en la matriz de marcadores; el último valor
+# acumula la probabilidad de MAX_GOALS o más goles
+MAX_GOALS = 10
+
+# Partidos por chunk al construir la matriz N×K×K: con K=11 un chunk ocupa
+# ~2 MB y queda en cache, lo que es más rápido que chunks grandes
+CHUNK_ROWS = 2048
+
+# Tasa mínima: los modelos no Poisson pueden predecir goles esperados <= 0
+MIN_RATE = 1e-6
+
+# Códigos de resultado
+LOCAL, EMPATE, VISITANTE = 0, 1, 2
+
+def poisson_pmf(rates, max_goals=MAX_GOALS):
+    """
+    Probabilidades de 0..max_goals goles para cada tasa (matriz N×K). Se
+    calculan con el producto acumulado pmf[k] = pmf[k-1]·λ/k, y la última
+    columna acumula la cola (max_goals o más goles) para que cada fila sume 1.
+    """
+    rates = np.clip(np.asarray(rates, dtype=np.float64), MIN_RATE, None)
+    ratios = np.empty((len(rates), max_goals + 1))
+    ratios[:, 0] = np.exp(-rates)
+    ratios[:, 1:] = rates[:, None] / np.arange(1, max_goals + 1)
+    pmf = np.cumprod(ratios, axis=1)
+    pmf[:, -1] = np.clip(1.0 - pmf[:, :-1].sum(axis=1), 0.0, None)
+    return pmf
+
+def scoreline_matrix(rate_local, rate_visitante, max_goals=MAX_GOALS):
+    """
+    Tensor N×K×K con la probabilidad de cada marcador [partido, goles local,
+    goles visitante], asumiendo goles de cada equipo Poisson independientes
+    """
+    return poisson_pmf(rate_local, max_goals)[:, :, None] * poisson_pmf(rate_visitante, max_goals)[:, None, :]
+
+def iter_scoreline_chunks(rate_local, rate_visitante, max_goals=MAX_GOALS, chunk_rows=CHUNK_ROWS):
+    """
+    Genera (inicio, tensor) por chunks de partidos, para no materializar el
+    tensor completo con millones de partidos
+    """
+    for start in range(0, len(rate_local), chunk_rows):
+        end = start + chunk_rows
+        yield start, scoreline_matrix(rate_local[start:end], rate_visitante[start:end], max_goals)
+
+def outcome_probabilities(rate_local, rate_visitante, max_goals=MAX_GOALS, chunk_rows=CHUNK_ROWS):
+    """
+    Probabilidades de victoria local, empate y victoria visitante (matriz N×3).
+    Suma la matriz de marcadores debajo, sobre y encima de la diagonal.
+    """
+    rate_local = np.asarray(rate_local, dtype=np.float64)
+    rate_visitante = np.asarray(rate_visitante, dtype=np.float64)
+    goals = np.arange(max_goals + 1)
+    local_wins = (goals[:, None] > goals[None, :]).ravel().astype(np.float64)
+    draws = (goals[:, None] == goals[None, :]).ravel().astype(np.float64)
+
+    probabilities = np.empty((len(rate_local), 3))
+    for start, matrix in iter_scoreline_chunks(rate_local, rate_visitante, max_goals, chunk_rows):
+        flat = matrix.reshape(len(matrix), -1)
+        end = start + len(matrix)
+        probabilities[start:end, LOCAL] = flat @ local_wins
+        probabilities[start:end, EMPATE] = flat @ draws
+        probabilities[start:end, VISITANTE] = 1.0 - probabilities[start:end, LOCAL] - probabilities[start:end, EMPATE]
+    return probabilities
+
+def most_likely_scores(rate_local, rate_visitante, max_goals=MAX_GOALS, chunk_rows=CHUNK_ROWS):
+    """
+    Marcador más probable de cada partido con su probabilidad y su cuota
+    justa (1 / probabilidad). Retorna (goles local, goles visitante,
+    probabilidad, cuota).
+    """
+    n = len(rate_local)
+    goals_local = np.empty(n, dtype=np.int64)
+    goals_visitante = np.empty(n, dtype=np.int64)
+    probability = np.empty(n)
+    for start, matrix in iter_scoreline_chunks(np.asarray(rate_local), np.asarray(rate_visitante), max_goals, chunk_rows):
+        flat = matrix.reshape(len(matrix), -1)
+        best = flat.argmax(axis=1)
+        end = start + len(matrix)
+        goals_local[start:end], goals_visitante[start:end] = np.divmod(best, max_goals + 1)
+        probability[start:end] = flat[np.arange(len(flat)), best]
+    return goals_local, goals_visitante, probability, 1.0 / probability
+
+def exact_score_odds(rate_local, rate_visitante, goals_local, goals_visitante, max_goals=MAX_GOALS):
+    """
+    Probabilidad y cuota justa de un marcador exacto para cada partido
+    """
+    goals_local = np.minimum(np.asarray(goals_local), max_goals)
+    goals_visitante = np.minimum(np.asarray(goals_visitante), max_goals)
+    rows = np.arange(len(goals_local))
+    probability = (poisson_pmf(rate_local, max_goals)[rows, goals_local] *
+                   poisson_pmf(rate_visitante, max_goals)[rows, goals_visitante])
+    with np.errstate(divide='ignore'):
+        return probability, 1.0 / probability
+
+def match_outcomes(goals_local, goals_visitante):
+    """
+    Código de resultado (LOCAL, EMPATE, VISITANTE) de cada partido
+    """
+    diff = np.sign(np.asarray(goals_local) - np.asarray(goals_visitante))
+    return np.where(diff > 0, LOCAL, np.where(diff == 0, EMPATE, VISITANTE))
+
+def outcome_metrics(y_true_local, y_true_visitante, y_pred_local, y_pred_visitante, max_goals=MAX_GOALS):
+    """
+    Brier score multiclase y log-loss de las probabilidades de resultado
+    (local/empate/visitante) derivadas de los goles esperados predichos
+    """
+    probabilities = outcome_probabilities(y_pred_local, y_pred_visitante, max_goals)
+    outcomes = match_outcomes(y_true_local, y_true_visitante)
+
+    one_hot = np.zeros_like(probabilities)
+    one_hot[np.arange(len(outcomes)), outcomes] = 1.0
+    observed = probabilities[np.arange(len(outcomes)), outcomes]
+
+    return {
+        'brier_resultado': float(np.mean(np.sum((probabilities - one_hot) ** 2, axis=1))),
+        'logloss_resultado': float(-np.mean(np.log(np.clip(observed, 1e-15, 1.0))))
+    }
+
+def parse_args():
+    """
+    Parsea los argumentos de línea de comandos
+    """
+    parser = argparse.ArgumentParser(description="Benchmark del motor de probabilidades de resultado")
+    parser.add_argument("--matches", type=int, default=1000000,
+                        help="Partidos a evaluar (default: 1000000)")
+    parser.add_argument("--max-goals", type=int, default=MAX_GOALS,
+                        help=f"Goles máximos por equipo en la matriz (default: {MAX_GOALS})")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    print("MOTOR DE PROBABILIDADES DE RESULTADO")
+    print("=" * 50)
+
+    rng = np.random.default_rng(42)
+    rate_local = rng.uniform(0.3, 3.0, args.matches)
+    rate_visitante = rng.uniform(0.3, 2.5, args.matches)
+
+    start_time = time.time()
+    probabilities = outcome_probabilities(rate_local, rate_visitante, args.max_goals)
+    elapsed = time.time() - start_time
+    print(f"Local/empate/visitante: {args.matches} partidos en {elapsed:.2f} segundos "
+          f"({args.matches / elapsed:.0f} partidos/s)")
+
+    start_time = time.time()
+    most_likely_scores(rate_local, rate_visitante, args.max_goals)
+    elapsed = time.time() - start_time
+    print(f"Marcador más probable: {args.matches} partidos en {elapsed:.2f} segundos "
+          f"({args.matches / elapsed:.0f} partidos/s)")
+
+    print(f"Promedios: local {probabilities[:, LOCAL].mean():.4f} | empate {probabilities[:, EMPATE].mean():.4f} | "
+          f"visitante {probabilities[:, VISITANTE].mean():.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,19 @@
 import numpy as np
-import pandas as pd
 import json
 import sys
+import time
 import mlflow
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.tracking import MlflowClient
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import LinearRegression, PoissonRegressor
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, accuracy_score, precision_score, recall_score, f1_score
+from joblib import Parallel, delayed
 from dotenv import load_dotenv
+from config_source import load_config_source
+from dataset_cache import load_train_test_split
+from metrics_engine import calculate_metrics
+from result_cache import CONFIG_HASH_TAG, get_config_hash, find_finished_run
+from tracking_calls import count_tracking_calls
 import os
 
 load_dotenv()
@@ -16,11 +22,11 @@ tracking_uri = os.getenv("MLFLOW_TRACKING_URI")
 
 def load_config(config_path):
     """
-    Carga la configuración desde un archivo JSON
+    Carga la configuración desde un archivo JSON o desde una línea de un
+    manifest JSONL (manifest.jsonl#N o manifest.jsonl@OFFSET)
     """
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        config = load_config_source(config_path)
         print(f"Configuración cargada desde: {config_path}")
         return config
     except FileNotFoundError:
@@ -30,6 +36,9 @@ def load_config(config_path):
         print(f"Error: El archivo {config_path} no es un JSON válido")
         sys.exit(1)
 
+# Modelos que aceptan un target 2D y se entrenan una sola vez en modo multi_output
+MULTI_OUTPUT_MODELS = {"RandomForestRegressor", "LinearRegression"}
+
 def get_model_class(model_type):
     """
     Retorna la clase del modelo según el tipo especificado
@@ -46,91 +55,122 @@ def get_model_class(model_type):
     
     return models[model_type]
 
-def train_and_evaluate_model(config):
+def uses_native_multi_output(config):
     """
-    Entrena y evalúa el modelo según la configuración
+    Indica si la configuración entrena un único estimador sobre ambos targets
     """
-    print(f"\n Iniciando entrenamiento: {config['run_name']}")
-    print(f"Modelo: {config['model_type']}")
-    print(f"Parámetros: {config['parameters']}")
+    return config.get('multi_output', False) and config['model_type'] in MULTI_OUTPUT_MODELS
+
+def _fit_estimator(ModelClass, parameters, X_train, y_train):
+    """
+    Entrena un estimador (función de módulo para poder ejecutarla con joblib)
+    """
+    return ModelClass(**parameters).fit(X_train, y_train)
+
+def fit_models(config, X_train, y_train_local, y_train_visitante):
+    """
+    Entrena los modelos de goles local y visitante.
     
-    # Configurar MLflow
-    mlflow.set_tracking_uri(uri=tracking_uri)
-    mlflow.set_experiment(config['experiment_name'])
-    
-    # Cargar dataset
-    df = pd.read_csv(config['dataset']['file_path'])
-    print(f"Dataset cargado: {config['dataset']['file_path']} ({len(df)} filas)")
-    
-    # Preparar features y targets
-    X = df[config['dataset']['features']]
-    y_local = df[config['dataset']['targets'][0]]  # goles_local
-    y_visitante = df[config['dataset']['targets'][1]]  # goles_visitante
-    
-    # Split de entrenamiento y test
-    X_train, X_test, y_train_local, y_test_local, y_train_visitante, y_test_visitante = train_test_split(
-        X, y_local, y_visitante, 
-        test_size=config['training']['test_size'], 
-        random_state=config['training']['random_state']
-    )
+    Con "multi_output": true en la configuración, los modelos que lo soportan
+    de forma nativa se entrenan una sola vez sobre ambos targets (y se retorna
+    el mismo estimador para los dos), y el resto entrena ambos en paralelo.
+    """
+    ModelClass = get_model_class(config['model_type'])
     
-    print(f"Datos de entrenamiento: {len(X_train)} muestras")
-    print(f"Datos de test: {len(X_test)} muestras")
+    if uses_native_multi_output(config):
+        print("\n Entrenando modelo multi-salida para equipo local y visitante...")
+        reg = ModelClass(**config['parameters'])
+        reg.fit(X_train, np.column_stack([y_train_local, y_train_visitante]))
+        return reg, reg
     
-    # Obtener clase del modelo
-    ModelClass = get_model_class(config['model_type'])
+    if config.get('multi_output', False):
+        print("\n Entrenando modelos para equipo local y visitante en paralelo...")
+        reg_local, reg_visitante = Parallel(n_jobs=2)(
+            delayed(_fit_estimator)(ModelClass, config['parameters'], X_train, y_train)
+            for y_train in (y_train_local, y_train_visitante)
+        )
+        return reg_local, reg_visitante
     
     # Entrenar modelo para equipo local
     print("\n Entrenando modelo para equipo local...")
     reg_local = ModelClass(**config['parameters'])
     reg_local.fit(X_train, y_train_local)
-    y_pred_local = reg_local.predict(X_test)
     
     # Entrenar modelo para equipo visitante
     print("Entrenando modelo para equipo visitante...")
     reg_visitante = ModelClass(**config['parameters'])
     reg_visitante.fit(X_train, y_train_visitante)
-    y_pred_visitante = reg_visitante.predict(X_test)
-    
-    # Calcular métricas
-    print("\nCalculando métricas...")
-    metrics = calculate_metrics(y_test_local, y_pred_local, y_test_visitante, y_pred_visitante)
     
-    # Mostrar resultados
-    print_results(metrics)
-    
-    # Registrar en MLflow
-    register_in_mlflow(config, metrics, reg_local, reg_visitante, X_train, y_pred_local)
+    return reg_local, reg_visitante
+
+def predict_models(config, reg_local, reg_visitante, X):
+    """
+    Predice goles local y visitante con los modelos entrenados
+    """
+    if uses_native_multi_output(config):
+        y_pred = reg_local.predict(X)
+        return y_pred[:, 0], y_pred[:, 1]
     
-    return metrics
+    return reg_local.predict(X), reg_visitante.predict(X)
 
-def calculate_metrics(y_test_local, y_pred_local, y_test_visitante, y_pred_visitante):
+def train_and_evaluate_model(config, force=None, uploader=None):
     """
-    Calcula todas las métricas de evaluación
+    Entrena y evalúa el modelo según la configuración.
+    
+    Si ya existe un run finalizado con el mismo hash de configuración se
+    reutilizan sus métricas sin reentrenar, salvo que force sea True (o la
+    variable de entorno FORCE_RETRAIN esté activada).
+    
+    Si se pasa un uploader (MlflowUploader), el registro en MLflow se encola
+    en segundo plano y la función retorna apenas termina la evaluación.
     """
-    metrics = {}
+    print(f"\n Iniciando entrenamiento: {config['run_name']}")
+    print(f"Modelo: {config['model_type']}")
+    print(f"Parámetros: {config['parameters']}")
     
-    # MSE
-    metrics['mse_local'] = mean_squared_error(y_test_local, y_pred_local)
-    metrics['mse_visitante'] = mean_squared_error(y_test_visitante, y_pred_visitante)
-    metrics['mse_promedio'] = (metrics['mse_local'] + metrics['mse_visitante']) / 2
+    if force is None:
+        force = os.getenv("FORCE_RETRAIN", "false").lower() in ("1", "true", "yes")
     
-    # Accuracy
-    metrics['accuracy_local'] = accuracy_score(y_test_local, np.round(y_pred_local))
-    metrics['accuracy_visitante'] = accuracy_score(y_test_visitante, np.round(y_pred_visitante))
-    metrics['accuracy_promedio'] = (metrics['accuracy_local'] + metrics['accuracy_visitante']) / 2
+    # Configurar MLflow
+    mlflow.set_tracking_uri(uri=tracking_uri)
+    experiment = mlflow.set_experiment(config['experiment_name'])
     
-    # Precision
-    metrics['precision_local'] = precision_score(y_test_local, np.round(y_pred_local), average='weighted', zero_division=0)
-    metrics['precision_visitante'] = precision_score(y_test_visitante, np.round(y_pred_visitante), average='weighted', zero_division=0)
+    # Reutilizar un run previo si la configuración no cambió
+    if not force:
+        config_hash = get_config_hash(config)
+        cached_run = find_finished_run(experiment.experiment_id, config_hash)
+        if cached_run is not None:
+            print(f"\nConfiguración sin cambios (hash {config_hash[:12]}), no se reentrena.")
+            print(f"Run existente: {cached_run.info.run_id} ({cached_run.info.run_name})")
+            return dict(cached_run.data.metrics)
     
-    # Recall
-    metrics['recall_local'] = recall_score(y_test_local, np.round(y_pred_local), average='weighted', zero_division=0)
-    metrics['recall_visitante'] = recall_score(y_test_visitante, np.round(y_pred_visitante), average='weighted', zero_division=0)
+    # Cargar dataset y split de entrenamiento/test desde el cache compartido
+    X_train, X_test, y_train_local, y_test_local, y_train_visitante, y_test_visitante = load_train_test_split(
+        config['dataset'], config['training']
+    )
     
-    # F1-score
-    metrics['f1_local'] = f1_score(y_test_local, np.round(y_pred_local), average='weighted', zero_division=0)
-    metrics['f1_visitante'] = f1_score(y_test_visitante, np.round(y_pred_visitante), average='weighted', zero_division=0)
+    print(f"Datos de entrenamiento: {len(X_train)} muestras")
+    print(f"Datos de test: {len(X_test)} muestras")
+    
+    # Entrenar modelos para equipo local y visitante
+    reg_local, reg_visitante = fit_models(config, X_train, y_train_local, y_train_visitante)
+    y_pred_local, y_pred_visitante = predict_models(config, reg_local, reg_visitante, X_test)
+    
+    # Calcular métricas
+    print("\nCalculando métricas...")
+    metrics = calculate_metrics(y_test_local, y_pred_local, y_test_visitante, y_pred_visitante)
+    
+    # Mostrar resultados
+    print_results(metrics)
+    
+    # Registrar en MLflow
+    if uploader is not None:
+        uploader.submit(config['run_name'], config, metrics, reg_local, reg_visitante, X_train, y_pred_local,
+                        experiment_id=experiment.experiment_id)
+        print(f"\n Registro en MLflow encolado en segundo plano ({uploader.pending()} pendientes)")
+    else:
+        register_in_mlflow(config, metrics, reg_local, reg_visitante, X_train, y_pred_local,
+                           experiment_id=experiment.experiment_id)
     
     return metrics
 
@@ -158,55 +198,90 @@ def print_results(metrics):
     print(f"\n Promedios:")
     print(f"   MSE Promedio: {metrics['mse_promedio']:.4f}")
     print(f"   Accuracy Promedio: {metrics['accuracy_promedio']:.4f}")
+    
+    print(f"\n Probabilidades de resultado:")
+    print(f"   Brier: {metrics['brier_resultado']:.4f}")
+    print(f"   Log-loss: {metrics['logloss_resultado']:.4f}")
 
-def register_in_mlflow(config, metrics, reg_local, reg_visitante, X_train, y_pred_local):
+def register_in_mlflow(config, metrics, reg_local, reg_visitante, X_train, y_pred_local, experiment_id=None):
     """
-    Registra el experimento en MLflow
+    Registra el experimento en MLflow.
+    
+    El experiment_id se pasa explícitamente para poder registrar desde
+    threads en segundo plano mientras el thread principal ya configuró el
+    experimento del siguiente modelo. Varios threads pueden tener su propio
+    run activo a la vez porque desde MLflow 2.18 el run activo es por thread
+    (por eso requirements.txt exige mlflow>=2.18.0).
     """
     print("\n Registrando en MLflow...")
     
-    with mlflow.start_run(run_name=config['run_name']):
-        # Log parameters
-        mlflow.log_params(config['parameters'])
+    with count_tracking_calls(tracking_uri) as tracking_calls:
+        with mlflow.start_run(experiment_id=experiment_id, run_name=config['run_name']) as run:
+            # Log parameters, metrics y tags en una sola llamada al tracking server
+            timestamp = int(time.time() * 1000)
+            params = [Param(name, str(value)) for name, value in config['parameters'].items()]
+            metrics_batch = [Metric(name, float(value), timestamp, 0) for name, value in metrics.items()]
+            tags = [RunTag("model_type", config['model_type']),
+                    RunTag("multi_output", str(config.get('multi_output', False))),
+                    RunTag(CONFIG_HASH_TAG, get_config_hash(config))]
+            tags += [RunTag(name, str(value)) for name, value in config['tags'].items()]
         
-        # Log metrics
-        for metric_name, metric_value in metrics.items():
-            mlflow.log_metric(metric_name, metric_value)
+            MlflowClient().log_batch(run.info.run_id, metrics=metrics_batch, params=params, tags=tags)
         
-        # Set tags
-        mlflow.set_tag("model_type", config['model_type'])
-        for tag_name, tag_value in config['tags'].items():
-            mlflow.set_tag(tag_name, tag_value)
-        
-        # Infer model signature
-        signature = mlflow.models.infer_signature(X_train, y_pred_local)
-        
-        # Log models
-        mlflow.sklearn.log_model(
-            sk_model=reg_local,
-            artifact_path="model_local",
-            signature=signature,
-            input_example=X_train.iloc[0].to_dict(),
-            registered_model_name=f"{config['model_type']}_JSON_Local_{config['run_name']}"
-        )
-        
-        mlflow.sklearn.log_model(
-            sk_model=reg_visitante,
-            artifact_path="model_visitante",
-            signature=signature,
-            input_example=X_train.iloc[0].to_dict(),
-            registered_model_name=f"{config['model_type']}_JSON_Visitante_{config['run_name']}"
-        )
+            if uses_native_multi_output(config):
+                # Un único modelo que predice [goles_local, goles_visitante]
+                signature = mlflow.models.infer_signature(X_train, reg_local.predict(X_train.iloc[:5]))
+                mlflow.sklearn.log_model(
+                    sk_model=reg_local,
+                    artifact_path="model_multi",
+                    signature=signature,
+                    input_example=X_train.iloc[0].to_dict(),
+                    registered_model_name=f"{config['model_type']}_JSON_Multi_{config['run_name']}"
+                )
+            else:
+                # Infer model signature
+                signature = mlflow.models.infer_signature(X_train, y_pred_local)
+            
+                # Log models
+                mlflow.sklearn.log_model(
+                    sk_model=reg_local,
+                    artifact_path="model_local",
+                    signature=signature,
+                    input_example=X_train.iloc[0].to_dict(),
+                    registered_model_name=f"{config['model_type']}_JSON_Local_{config['run_name']}"
+                )
+            
+                mlflow.sklearn.log_model(
+                    sk_model=reg_visitante,
+                    artifact_path="model_visitante",
+                    signature=signature,
+                    input_example=X_train.iloc[0].to_dict(),
+                    registered_model_name=f"{config['model_type']}_JSON_Visitante_{config['run_name']}"
+                )
+    
+    # Llamadas medidas de este run: create_run, log_batch, subida de artefactos,
+    # registro de modelos y set_terminated. Sin log_batch, el log_batch se
+    # reemplazaría por un log_params más una llamada por métrica y por tag.
+    if tracking_calls['calls']:
+        unbatched_calls = tracking_calls['calls'] + len(metrics_batch) + len(tags)
+        print(f"Llamadas HTTP al tracking server en este run: {tracking_calls['calls']} "
+              f"(sin log_batch serían {unbatched_calls})")
+    else:
+        print("Tracking store local: sin llamadas HTTP al tracking server")
     
     print(f" Experimento '{config['run_name']}' registrado exitosamente en MLflow!")
 
 def main():
-    if len(sys.argv) != 2:
-        print("Uso: python3 predictor_from_json.py <config_file.json>")
+    force = "--force" in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != "--force"]
+    
+    if len(args) != 1:
+        print("Uso: python3 predictor_from_json.py <config_file.json> [--force]")
         print("Ejemplo: python3 predictor_from_json.py configs/random_forest_config_1.json")
+        print("   --force: reentrena aunque ya exista un run con la misma configuración")
         sys.exit(1)
     
-    config_path = sys.argv[1]
+    config_path = args[0]
     
     print("PREDICTOR BASADO EN CONFIGURACIÓN JSON")
     print("=" * 50)
@@ -215,7 +290,7 @@ def main():
     config = load_config(config_path)
     
     # Entrenar y evaluar
-    metrics = train_and_evaluate_model(config)
+    metrics = train_and_evaluate_model(config, force=force or None)
     
     print(f"\n Experimento completado exitosamente!")
     print(f" Revisa los resultados en MLflow: {tracking_uri}")
@@ -0,0 +1,65 @@
+import os
+import json
+import hashlib
+from mlflow.tracking import MlflowClient
+
+# Tag con el que se registra el hash de la configuración en cada run
+CONFIG_HASH_TAG = "config_hash"
+
+# Digests de archivos ya calculados, indexados por (ruta, mtime, tamaño)
+_file_digests = {}
+
+def get_file_digest(file_path):
+    """
+    Calcula el SHA-256 del contenido de un archivo. El resultado se memoriza
+    mientras el archivo no cambie de fecha de modificación ni de tamaño.
+    """
+    file_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    key = (file_path, stat.st_mtime_ns, stat.st_size)
+
+    if key not in _file_digests:
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        _file_digests[key] = digest.hexdigest()
+
+    return _file_digests[key]
+
+def get_config_hash(config):
+    """
+    Calcula el hash de contenido de una configuración.
+
+    Incluye el tipo de modelo, los parámetros, el digest del dataset (no su
+    ruta) con las columnas usadas y el bloque de entrenamiento. Se excluyen
+    run_name, experiment_name y los tags, que cambian entre generaciones
+    (p. ej. 'generated_at') sin cambiar el resultado del entrenamiento.
+    """
+    payload = {
+        'model_type': config['model_type'],
+        'parameters': config['parameters'],
+        'dataset': {
+            'file_digest': get_file_digest(config['dataset']['file_path']),
+            'features': config['dataset']['features'],
+            'targets': config['dataset']['targets']
+        },
+        'training': config['training']
+    }
+    # Solo se incluye si está activo, para no invalidar los hashes ya registrados
+    if config.get('multi_output', False):
+        payload['multi_output'] = True
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+def find_finished_run(experiment_id, config_hash):
+    """
+    Busca en el tracking server el último run finalizado con el mismo hash de
+    configuración. Retorna el run o None si no existe.
+    """
+    runs = MlflowClient().search_runs(
+        experiment_ids=[experiment_id],
+        filter_string=f"tags.{CONFIG_HASH_TAG} = '{config_hash}' and attributes.status = 'FINISHED'",
+        order_by=["attributes.end_time DESC"],
+        max_results=1
+    )
+    return runs[0] if runs else None
@@ -1,14 +1,26 @@
 import subprocess
 import time
 import os
-import json
 import glob
+import io
+import argparse
+import traceback
+import contextlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
+from config_source import load_config_source, iter_manifest_sources, group_config_families
+from worker_env import get_worker_env, get_worker_limits, apply_worker_env
 
-def get_available_configs():
+def get_available_configs(manifest=None):
     """
-    Obtiene la lista de archivos de configuración disponibles
+    Obtiene la lista de archivos de configuración disponibles. Si se indica un
+    manifest JSONL, retorna una referencia (manifest.jsonl@OFFSET) por línea.
     """
+    if manifest:
+        return list(iter_manifest_sources(manifest))
+    
     config_files = glob.glob("configs/*.json")
     # Filtrar el archivo index.json
     config_files = [f for f in config_files if not f.endswith('index.json')]
@@ -20,8 +32,7 @@ def load_config_info(config_path):
     Carga información básica de un archivo de configuración
     """
     try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
+        config = load_config_source(config_path)
         return {
             'model_type': config.get('model_type', 'Unknown'),
             'run_name': config.get('run_name', 'Unknown'),
@@ -30,13 +41,44 @@ def load_config_info(config_path):
     except:
         return {'model_type': 'Error', 'run_name': 'Error', 'experiment_name': 'Error'}
 
-def run_experiment_from_json(config_file):
+def build_experiment_command(config_file):
     """
-    Ejecuta un experimento desde un archivo JSON
+    Construye el comando para ejecutar un experimento en un intérprete nuevo
     """
     # Usar sys.executable para garantizar compatibilidad multiplataforma
     import sys
-    cmd = [sys.executable, "predictor_from_json.py", config_file]
+    return [sys.executable, "predictor_from_json.py", config_file]
+
+def execute_experiment(config_file, env=None):
+    """
+    Ejecuta un experimento en un subproceso y retorna su resultado sin imprimirlo
+    """
+    cmd = build_experiment_command(config_file)
+    start_time = time.time()
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True, env=env)
+        return {
+            'config_file': config_file,
+            'success': True,
+            'elapsed': time.time() - start_time,
+            'stdout': result.stdout,
+            'stderr': result.stderr
+        }
+    except subprocess.CalledProcessError as e:
+        return {
+            'config_file': config_file,
+            'success': False,
+            'elapsed': time.time() - start_time,
+            'stdout': e.stdout,
+            'stderr': e.stderr,
+            'error': str(e)
+        }
+
+def run_experiment_from_json(config_file):
+    """
+    Ejecuta un experimento desde un archivo JSON
+    """
+    cmd = build_experiment_command(config_file)
     
     print(f"\n{'='*60}")
     print(f"Ejecutando experimento desde: {config_file}")
@@ -64,11 +106,281 @@ def run_experiment_from_json(config_file):
         print(f"Experimento falló después de {end_time - start_time:.2f} segundos")
         return False
 
-def run_all_experiments():
+def run_experiments_parallel(config_files, workers):
+    """
+    Ejecuta los experimentos con un pool acotado de N workers concurrentes.
+    
+    Cada experimento sigue corriendo en su propio intérprete; el pool solo
+    limita cuántos corren a la vez. El progreso se imprime a medida que
+    termina cada experimento.
+    """
+    env = get_worker_env(workers)
+    total = len(config_files)
+    print(f"\nEjecutando {total} experimentos con {workers} workers "
+          f"({env['LOKY_MAX_CPU_COUNT']} núcleos por worker)...")
+    
+    successful = 0
+    failed = 0
+    start_time = time.time()
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(execute_experiment, config_file, env): config_file
+                   for config_file in config_files}
+        
+        for i, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            info = load_config_info(result['config_file'])
+            
+            if result['success']:
+                successful += 1
+                print(f"[{i}/{total}] OK    {info['model_type']:25s} | {info['run_name']:20s} | "
+                      f"{result['elapsed']:.2f} segundos")
+            else:
+                failed += 1
+                print(f"[{i}/{total}] ERROR {info['model_type']:25s} | {info['run_name']:20s} | "
+                      f"{result['elapsed']:.2f} segundos")
+                print(f"ERROR en experimento: {result['error']}")
+                print("STDOUT:", result['stdout'])
+                print("STDERR:", result['stderr'])
+    
+    print(f"\nTiempo total de ejecución: {time.time() - start_time:.2f} segundos")
+    return successful, failed, total
+
+def load_predictor():
+    """
+    Importa predictor_from_json una sola vez y mide el costo de arranque
+    (imports de numpy/pandas/sklearn/mlflow y load_dotenv)
+    """
+    start_time = time.time()
+    import predictor_from_json
+    return predictor_from_json, time.time() - start_time
+
+def run_config_in_process(predictor, config_file, uploader=None):
+    """
+    Entrena un experimento dentro del proceso actual. Cualquier error del
+    experimento (incluido un sys.exit de load_config) se captura para no
+    interrumpir el resto del lote.
+    """
+    start_time = time.time()
+    try:
+        config = predictor.load_config(config_file)
+        predictor.train_and_evaluate_model(config, uploader=uploader)
+        return {'config_file': config_file, 'success': True, 'elapsed': time.time() - start_time}
+    except (Exception, SystemExit):
+        return {
+            'config_file': config_file,
+            'success': False,
+            'elapsed': time.time() - start_time,
+            'error': traceback.format_exc()
+        }
+
+def run_family_in_process(config_files, uploader=None):
+    """
+    Entrena una familia de configuraciones que solo difieren en n_estimators
+    con un único ensamble que crece con warm_start. Retorna un resultado por
+    configuración; si la familia falla, las configuraciones que faltaban se
+    informan con el error.
+    """
+    import warm_start
+    results = []
+    start_time = time.time()
+    try:
+        configs = [load_config_source(config_file) for config_file in config_files]
+        for config_file, _ in zip(config_files, warm_start.train_warm_start_family(configs, uploader=uploader)):
+            results.append({'config_file': config_file, 'success': True, 'elapsed': time.time() - start_time})
+            start_time = time.time()
+    except (Exception, SystemExit):
+        error = traceback.format_exc()
+        results += [{'config_file': config_file, 'success': False, 'elapsed': time.time() - start_time,
+                     'error': error} for config_file in config_files[len(results):]]
+    return results
+
+def run_unit_in_process(predictor, config_files, uploader=None):
+    """
+    Ejecuta una unidad de trabajo: un experimento suelto o una familia warm start
+    """
+    if len(config_files) == 1:
+        return [run_config_in_process(predictor, config_files[0], uploader=uploader)]
+    return run_family_in_process(config_files, uploader=uploader)
+
+def _failed_unit_results(unit, error):
+    """
+    Resultados fallidos de todas las configuraciones de una unidad cuyo worker no respondió
+    """
+    return [{'config_file': config_file, 'success': False, 'elapsed': 0.0,
+             'error': f"{type(error).__name__}: {error}", 'stdout': ''} for config_file in unit]
+
+_worker_predictor = None
+_worker_startup_time = 0.0
+
+def _init_in_process_worker(env):
+    """
+    Inicializa un worker del pool: aplica el reparto de núcleos e importa
+    el predictor una única vez por proceso
+    """
+    global _worker_predictor, _worker_startup_time
+    apply_worker_env(env)
+    _worker_predictor, _worker_startup_time = load_predictor()
+
+def _run_unit_in_worker(config_files):
+    """
+    Ejecuta un experimento (o una familia warm start) en un worker del pool
+    capturando su salida
+    """
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        results = run_unit_in_process(_worker_predictor, config_files)
+    for result in results:
+        result['stdout'] = output.getvalue()
+        result['pid'] = os.getpid()
+        result['startup'] = _worker_startup_time
+    return results
+
+def run_experiments_in_process(config_files, workers=1, upload_threads=0, warm_start=False):
+    """
+    Ejecuta los experimentos llamando directamente a train_and_evaluate_model,
+    sin levantar un intérprete nuevo por experimento.
+    
+    Con workers > 1 se usa un pool de procesos donde cada worker importa el
+    predictor una sola vez y luego ejecuta varios experimentos.
+    
+    Con upload_threads > 0 (solo en modo secuencial) el registro de modelos
+    en MLflow se hace en segundo plano mientras se entrena el siguiente
+    experimento; antes de terminar se espera a que se vacíe la cola.
+    
+    Con warm_start, las configuraciones de RandomForest y GradientBoosting que
+    solo difieren en n_estimators se entrenan como una familia: un único
+    ensamble que crece de menor a mayor, registrando un run por tamaño.
+    """
+    total = len(config_files)
+    if warm_start:
+        units = group_config_families(config_files)
+        families = sum(1 for unit in units if len(unit) > 1)
+        print(f"\nWarm start: {families} familias por n_estimators ({total} experimentos en {len(units)} unidades)")
+    else:
+        units = [[config_file] for config_file in config_files]
+    successful = 0
+    failed = 0
+    start_time = time.time()
+    
+    if workers <= 1:
+        predictor, startup_time = load_predictor()
+        print(f"\nArranque del runner (imports + load_dotenv): {startup_time:.2f} segundos")
+        
+        uploader = None
+        if upload_threads > 0:
+            from mlflow_uploader import MlflowUploader
+            uploader = MlflowUploader(predictor.register_in_mlflow, max_workers=upload_threads,
+                                      max_pending=upload_threads * 2)
+            print(f"Registro en MLflow en segundo plano con {upload_threads} threads")
+        
+        done = 0
+        for unit in units:
+            info = load_config_info(unit[0])
+            if len(unit) == 1:
+                print(f"\nProgreso: {done + 1}/{total} - Ejecutando {info['model_type']} ({info['run_name']})")
+            else:
+                print(f"\nProgreso: {done + 1}-{done + len(unit)}/{total} - Ejecutando familia warm start "
+                      f"de {info['model_type']} ({len(unit)} experimentos)")
+            print(f"{'='*60}")
+            
+            for result in run_unit_in_process(predictor, unit, uploader=uploader):
+                if result['success']:
+                    successful += 1
+                    print(f"Experimento completado en {result['elapsed']:.2f} segundos")
+                else:
+                    failed += 1
+                    print(f"ERROR en experimento:\n{result['error']}")
+                    print(f"Experimento falló después de {result['elapsed']:.2f} segundos")
+            done += len(unit)
+        
+        if uploader is not None:
+            print(f"\nEsperando a que terminen {uploader.pending()} registros en MLflow...")
+            drain_start = time.time()
+            failures = uploader.drain()
+            print(f"Cola de registro vaciada en {time.time() - drain_start:.2f} segundos")
+            for run_name, error in failures:
+                successful -= 1
+                failed += 1
+                print(f"ERROR registrando {run_name} en MLflow:\n{error}")
+    else:
+        if upload_threads > 0:
+            print("\n--upload-threads se ignora con --workers > 1: cada worker registra sus modelos")
+        worker_env = get_worker_limits(workers)
+        print(f"\nEjecutando {total} experimentos en {workers} procesos "
+              f"({worker_env['LOKY_MAX_CPU_COUNT']} núcleos por worker)...")
+        startup_by_pid = {}
+        completed = 0
+        
+        def report(results):
+            nonlocal completed, successful, failed
+            for result in results:
+                completed += 1
+                info = load_config_info(result['config_file'])
+                if 'pid' in result:
+                    startup_by_pid[result['pid']] = result['startup']
+                
+                if result['success']:
+                    successful += 1
+                    print(f"[{completed}/{total}] OK    {info['model_type']:25s} | {info['run_name']:20s} | "
+                          f"{result['elapsed']:.2f} segundos")
+                else:
+                    failed += 1
+                    print(f"[{completed}/{total}] ERROR {info['model_type']:25s} | {info['run_name']:20s} | "
+                          f"{result['elapsed']:.2f} segundos")
+                    print("STDOUT:", result['stdout'])
+                    print(f"ERROR en experimento:\n{result['error']}")
+        
+        # Si un worker muere (falta de memoria, segfault nativo) el pool entero
+        # queda roto y todos sus futures fallan con BrokenProcessPool. Como se
+        # envían como mucho `workers` unidades a la vez, las que fallan así son
+        # justamente las que estaban corriendo: se marcan como fallidas y las
+        # que no llegaron a enviarse siguen en un pool nuevo.
+        pending_units = deque(units)
+        while pending_units:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_in_process_worker,
+                                     initargs=(worker_env,)) as executor:
+                in_flight = {}
+                broken = False
+                while not broken and (pending_units or in_flight):
+                    while pending_units and len(in_flight) < workers:
+                        unit = pending_units.popleft()
+                        in_flight[executor.submit(_run_unit_in_worker, unit)] = unit
+                    
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        unit = in_flight.pop(future)
+                        try:
+                            results = future.result()
+                        except Exception as e:
+                            broken = broken or isinstance(e, BrokenProcessPool)
+                            results = _failed_unit_results(unit, e)
+                        report(results)
+                
+                # Unidades que corrían en el pool roto y todavía no se informaron
+                for future, unit in in_flight.items():
+                    try:
+                        results = future.result()
+                    except Exception as e:
+                        results = _failed_unit_results(unit, e)
+                    report(results)
+            
+            if broken and pending_units:
+                print(f"\nUn worker terminó inesperadamente; se reinicia el pool para las "
+                      f"{sum(len(unit) for unit in pending_units)} configuraciones restantes")
+        
+        if startup_by_pid:
+            print(f"\nArranque de workers (imports + load_dotenv): {len(startup_by_pid)} procesos, "
+                  f"{sum(startup_by_pid.values()) / len(startup_by_pid):.2f} segundos en promedio")
+    
+    print(f"\nTiempo total de ejecución: {time.time() - start_time:.2f} segundos")
+    return successful, failed, total
+
+def run_all_experiments(workers=1, in_process=False, upload_threads=0, manifest=None, warm_start=False):
     """
     Ejecuta todos los experimentos disponibles
     """
-    config_files = get_available_configs()
+    config_files = get_available_configs(manifest)
     
     if not config_files:
         print("No se encontraron archivos de configuración JSON")
@@ -86,6 +398,11 @@ def run_all_experiments():
     
     print("\nIniciando ejecución de todos los experimentos...")
     
+    if in_process:
+        return run_experiments_in_process(config_files, workers, upload_threads, warm_start)
+    if workers > 1:
+        return run_experiments_parallel(config_files, workers)
+    
     successful = 0
     failed = 0
     
@@ -107,15 +424,19 @@ def run_all_experiments():
     
     return successful, failed, len(config_files)
 
-def run_selected_experiments(pattern=None, model_type=None):
+def run_selected_experiments(pattern=None, model_type=None, workers=1, in_process=False, upload_threads=0,
+                             manifest=None, warm_start=False):
     """
     Ejecuta experimentos filtrados por patrón o tipo de modelo
     """
-    config_files = get_available_configs()
+    config_files = get_available_configs(manifest)
     
-    # Filtrar por patrón
+    # Filtrar por patrón: sobre el nombre del archivo o, con un manifest, sobre el run_name
     if pattern:
-        config_files = [f for f in config_files if pattern.lower() in f.lower()]
+        if manifest:
+            config_files = [f for f in config_files if pattern.lower() in load_config_info(f)['run_name'].lower()]
+        else:
+            config_files = [f for f in config_files if pattern.lower() in f.lower()]
     
     # Filtrar por tipo de modelo
     if model_type:
@@ -136,6 +457,11 @@ def run_selected_experiments(pattern=None, model_type=None):
     
     print(f"Ejecutando {len(config_files)} experimentos filtrados")
     
+    if in_process:
+        return run_experiments_in_process(config_files, workers, upload_threads, warm_start)
+    if workers > 1:
+        return run_experiments_parallel(config_files, workers)
+    
     successful = 0
     failed = 0
     
@@ -157,11 +483,11 @@ def run_selected_experiments(pattern=None, model_type=None):
     
     return successful, failed, len(config_files)
 
-def show_available_experiments():
+def show_available_experiments(manifest=None):
     """
     Muestra todos los experimentos disponibles sin ejecutarlos
     """
-    config_files = get_available_configs()
+    config_files = get_available_configs(manifest)
     
     if not config_files:
         print("No se encontraron archivos de configuración JSON")
@@ -185,16 +511,78 @@ def show_available_experiments():
         for config_file, info in experiments:
             print(f"   • {info['run_name']:20s} | {os.path.basename(config_file)}")
 
+def parse_args():
+    """
+    Parsea los argumentos de línea de comandos
+    """
+    parser = argparse.ArgumentParser(description="Ejecutor de experimentos JSON")
+    parser.add_argument("--all", action="store_true",
+                        help="Ejecuta todos los experimentos sin menú interactivo")
+    parser.add_argument("--model-type",
+                        help="Ejecuta solo los experimentos de este tipo de modelo (ej: RandomForest)")
+    parser.add_argument("--pattern",
+                        help="Ejecuta solo los archivos de configuración que contengan este patrón "
+                             "(con --manifest, los run_name que lo contengan)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Cantidad de experimentos a ejecutar en paralelo (default: 1, secuencial)")
+    parser.add_argument("--in-process", action="store_true",
+                        help="Entrena en el mismo proceso, importando sklearn/pandas/mlflow una sola vez")
+    parser.add_argument("--upload-threads", type=int, default=0,
+                        help="Con --in-process, registra los modelos en MLflow en segundo plano con N threads")
+    parser.add_argument("--manifest",
+                        help="Lee las configuraciones de un manifest JSONL en lugar de configs/*.json")
+    parser.add_argument("--warm-start", action="store_true",
+                        help="Entrena las configuraciones que solo difieren en n_estimators con un único "
+                             "ensamble que crece (implica --in-process)")
+    parser.add_argument("--force", action="store_true",
+                        help="Reentrena aunque ya exista un run finalizado con la misma configuración")
+    return parser.parse_args()
+
 def main():
+    args = parse_args()
+    
     print("EJECUTOR DE EXPERIMENTOS JSON")
     print("=" * 50)
     
-    # Verificar que existe el directorio de configs
-    if not os.path.exists('configs'):
+    manifest = args.manifest
+    
+    # Verificar que existe el directorio de configs o el manifest
+    if manifest and not os.path.exists(manifest):
+        print(f"No se encontró el manifest '{manifest}'")
+        print("Ejecuta primero: python generate_json_configs.py --manifest <archivo.jsonl>")
+        return
+    if not manifest and not os.path.exists('configs'):
         print("No se encontró el directorio 'configs/'")
         print("Ejecuta primero: python generate_json_configs.py")
         return
     
+    workers = max(1, args.workers)
+    in_process = args.in_process or args.warm_start
+    upload_threads = max(0, args.upload_threads)
+    
+    # Los subprocesos y workers heredan la variable de entorno
+    if args.force:
+        os.environ["FORCE_RETRAIN"] = "1"
+    
+    run_options = {
+        'workers': workers,
+        'in_process': in_process,
+        'upload_threads': upload_threads,
+        'manifest': manifest,
+        'warm_start': args.warm_start
+    }
+    
+    # Modo no interactivo
+    if args.all or args.model_type or args.pattern:
+        if args.all:
+            print("\nEjecutando TODOS los experimentos...")
+            result = run_all_experiments(**run_options)
+        else:
+            result = run_selected_experiments(pattern=args.pattern, model_type=args.model_type, **run_options)
+        if result:
+            print_summary(*result)
+        return
+    
     # Mostrar opciones
     print("\nOPCIONES DISPONIBLES:")
     print("1. Ver todos los experimentos disponibles")
@@ -207,31 +595,31 @@ def main():
     choice = input("\nSelecciona una opción (1-6): ").strip()
     
     if choice == "1":
-        show_available_experiments()
+        show_available_experiments(manifest)
     
     elif choice == "2":
         print("\nEjecutando TODOS los experimentos...")
-        successful, failed, total = run_all_experiments()
+        successful, failed, total = run_all_experiments(**run_options)
         print_summary(successful, failed, total)
     
     elif choice == "3":
         print("\nEjecutando experimentos de RandomForest...")
-        successful, failed, total = run_selected_experiments(model_type="RandomForest")
+        successful, failed, total = run_selected_experiments(model_type="RandomForest", **run_options)
         print_summary(successful, failed, total)
     
     elif choice == "4":
         print("\nEjecutando experimentos de GradientBoosting...")
-        successful, failed, total = run_selected_experiments(model_type="GradientBoosting")
+        successful, failed, total = run_selected_experiments(model_type="GradientBoosting", **run_options)
         print_summary(successful, failed, total)
     
     elif choice == "5":
         print("\nEjecutando experimentos de LinearRegression...")
-        successful, failed, total = run_selected_experiments(model_type="LinearRegression")
+        successful, failed, total = run_selected_experiments(model_type="LinearRegression", **run_options)
         print_summary(successful, failed, total)
     
     elif choice == "6":
         print("\nEjecutando experimentos de PoissonRegressor...")
-        successful, failed, total = run_selected_experiments(model_type="PoissonRegressor")
+        successful, failed, total = run_selected_experiments(model_type="PoissonRegressor", **run_options)
         print_summary(successful, failed, total)
     
     else:
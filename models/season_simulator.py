@@ -0,0 +1,255 @@
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from serving import FEATURES, load_model_pair, predict_goals
+from outcome_probabilities import MIN_RATE
+from worker_env import get_worker_limits, apply_worker_env
+
+# Simulaciones por chunk (cada chunk usa su propia semilla derivada)
+CHUNK_SIMS = 5000
+
+# Pesos del criterio de desempate: puntos, diferencia de gol y goles a favor
+# (la diferencia de gol se desplaza para que sea positiva)
+POINTS_WEIGHT = 1e7
+GOAL_DIFF_WEIGHT = 1e4
+GOAL_DIFF_OFFSET = 5000
+
+def load_fixtures(dataset_path, season=None):
+    """
+    Carga los partidos de una temporada del dataset (por defecto, la última)
+    """
+    dataset = pd.read_csv(dataset_path)
+    if season is None:
+        season = int(dataset['temporada'].max())
+    fixtures = dataset[dataset['temporada'] == season].reset_index(drop=True)
+    if fixtures.empty:
+        raise ValueError(f"No hay partidos de la temporada {season} en {dataset_path}")
+    return fixtures, season
+
+def build_season(fixtures, played_until=0):
+    """
+    Separa los partidos ya jugados (jornada <= played_until) de los que se
+    simulan. Retorna (equipos, índices local/visitante de los partidos a
+    simular, puntos/diferencia de gol/goles a favor ya obtenidos).
+    """
+    teams = np.array(sorted(set(fixtures['equipo_local']) | set(fixtures['equipo_visitante'])))
+    team_index = {team: i for i, team in enumerate(teams)}
+    home = fixtures['equipo_local'].map(team_index).to_numpy()
+    away = fixtures['equipo_visitante'].map(team_index).to_numpy()
+
+    played = fixtures['jornada'].to_numpy() <= played_until
+    goals_local = fixtures['goles_local'].to_numpy()[played]
+    goals_visitante = fixtures['goles_visitante'].to_numpy()[played]
+    base_table = season_tables(goals_local[None, :], goals_visitante[None, :], home[played], away[played], len(teams))
+
+    return teams, home[~played], away[~played], ~played, base_table
+
+def incidence_matrices(home, away, n_teams):
+    """
+    Matrices partidos × equipos que indican quién juega de local y de visitante
+    """
+    rows = np.arange(len(home))
+    home_matrix = np.zeros((len(home), n_teams), dtype=np.float32)
+    away_matrix = np.zeros((len(away), n_teams), dtype=np.float32)
+    home_matrix[rows, home] = 1.0
+    away_matrix[rows, away] = 1.0
+    return home_matrix, away_matrix
+
+def season_tables(goals_local, goals_visitante, home, away, n_teams):
+    """
+    Tablas de posiciones de un conjunto de simulaciones (matrices
+    simulaciones × partidos de goles). Las sumas por equipo se hacen con
+    productos contra las matrices de incidencia en lugar de recorrer los
+    partidos. Retorna (puntos, diferencia de gol, goles a favor), cada uno
+    de forma simulaciones × equipos.
+    """
+    home_matrix, away_matrix = incidence_matrices(home, away, n_teams)
+    goals_local = goals_local.astype(np.float32)
+    goals_visitante = goals_visitante.astype(np.float32)
+
+    draws = goals_local == goals_visitante
+    points_local = 3 * (goals_local > goals_visitante) + draws
+    points_visitante = 3 * (goals_local < goals_visitante) + draws
+
+    points = points_local.astype(np.float32) @ home_matrix + points_visitante.astype(np.float32) @ away_matrix
+    goal_diff = (goals_local - goals_visitante) @ (home_matrix - away_matrix)
+    goals_for = goals_local @ home_matrix + goals_visitante @ away_matrix
+    return points, goal_diff, goals_for
+
+def simulate_chunk(rate_local, rate_visitante, home, away, n_teams, base_table, n_sims, n_relegated, seed_sequence):
+    """
+    Simula n_sims temporadas y retorna los conteos agregados: veces campeón,
+    veces descendido, distribución de posiciones (equipos × posiciones) y
+    suma de puntos por equipo
+    """
+    rng = np.random.default_rng(seed_sequence)
+    goals_local = rng.poisson(rate_local, size=(n_sims, len(rate_local)))
+    goals_visitante = rng.poisson(rate_visitante, size=(n_sims, len(rate_visitante)))
+
+    points, goal_diff, goals_for = season_tables(goals_local, goals_visitante, home, away, n_teams)
+    points += base_table[0]
+    goal_diff += base_table[1]
+    goals_for += base_table[2]
+
+    # Desempate: puntos, diferencia de gol, goles a favor y sorteo
+    key = (points.astype(np.float64) * POINTS_WEIGHT + (goal_diff + GOAL_DIFF_OFFSET) * GOAL_DIFF_WEIGHT
+           + goals_for + rng.random(points.shape))
+    standings = np.argsort(-key, axis=1)
+
+    positions = np.bincount((standings * n_teams + np.arange(n_teams)).ravel(), minlength=n_teams * n_teams)
+    return {
+        'title': np.bincount(standings[:, 0], minlength=n_teams),
+        'relegation': np.bincount(standings[:, n_teams - n_relegated:].ravel(), minlength=n_teams),
+        'positions': positions.reshape(n_teams, n_teams),
+        'points': points.sum(axis=0, dtype=np.float64)
+    }
+
+def _init_worker(worker_env):
+    """
+    Limita los hilos de BLAS de cada worker a su parte de los núcleos
+    """
+    apply_worker_env(worker_env)
+
+def _simulate_chunk_in_worker(args):
+    return simulate_chunk(*args)
+
+def simulate_season(rate_local, rate_visitante, home, away, n_teams, base_table, n_sims, n_relegated=3,
+                    seed=42, workers=1, chunk_sims=CHUNK_SIMS):
+    """
+    Simula n_sims temporadas en chunks, opcionalmente repartidos en un pool
+    de procesos. Cada chunk usa una semilla de SeedSequence(seed).spawn, por
+    lo que el resultado es reproducible y no depende de la cantidad de workers.
+    Retorna las probabilidades de título y descenso, la distribución de
+    posiciones y los puntos esperados de cada equipo.
+    """
+    chunk_sizes = [min(chunk_sims, n_sims - start) for start in range(0, n_sims, chunk_sims)]
+    seeds = np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+    tasks = [(rate_local, rate_visitante, home, away, n_teams, base_table, size, n_relegated, seed_sequence)
+             for size, seed_sequence in zip(chunk_sizes, seeds)]
+
+    if workers <= 1:
+        results = map(_simulate_chunk_in_worker, tasks)
+        return aggregate_results(results, n_sims)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(get_worker_limits(workers),)) as executor:
+        return aggregate_results(executor.map(_simulate_chunk_in_worker, tasks), n_sims)
+
+def aggregate_results(results, n_sims):
+    """
+    Suma los conteos de todos los chunks y los convierte en probabilidades
+    """
+    total = None
+    for result in results:
+        if total is None:
+            total = result
+        else:
+            total = {name: total[name] + counts for name, counts in result.items()}
+
+    return {
+        'title': total['title'] / n_sims,
+        'relegation': total['relegation'] / n_sims,
+        'positions': total['positions'] / n_sims,
+        'expected_points': total['points'] / n_sims
+    }
+
+def get_goal_rates(fixtures, model_type, run_name, version="latest"):
+    """
+    Goles esperados de cada partido según el par de modelos registrado.
+    Sin partidos pendientes no hace falta cargar los modelos.
+    """
+    if len(fixtures) == 0:
+        return np.empty(0), np.empty(0)
+    model_pair = load_model_pair(model_type, run_name, version)
+    rate_local, rate_visitante = predict_goals(model_pair, fixtures[FEATURES].to_numpy(dtype=np.float64))
+    return np.clip(rate_local, MIN_RATE, None), np.clip(rate_visitante, MIN_RATE, None)
+
+def print_table(teams, results, n_relegated):
+    """
+    Imprime los equipos ordenados por puntos esperados con sus probabilidades
+    """
+    order = np.argsort(-results['expected_points'])
+    print(f"\n{'Equipo':15s} | {'Pts esperados':>13s} | {'Campeón':>8s} | {'Descenso':>8s}")
+    print("-" * 55)
+    for team in order:
+        print(f"{teams[team]:15s} | {results['expected_points'][team]:13.1f} | "
+              f"{results['title'][team]:8.2%} | {results['relegation'][team]:8.2%}")
+    print(f"\n(descienden los últimos {n_relegated})")
+
+def parse_args():
+    """
+    Parsea los argumentos de línea de comandos
+    """
+    parser = argparse.ArgumentParser(description="Simulador Monte Carlo de temporadas con los modelos de goles registrados")
+    parser.add_argument("--model-type", required=True,
+                        help="Tipo de modelo registrado (ej: PoissonRegressor)")
+    parser.add_argument("--run-name", required=True,
+                        help="run_name de la configuración (ej: PR_config_01)")
+    parser.add_argument("--version", default="latest",
+                        help="Versión de los modelos registrados (default: latest)")
+    parser.add_argument("--dataset", default="dataset_futbol_simulado.csv",
+                        help="CSV con los partidos (default: dataset_futbol_simulado.csv)")
+    parser.add_argument("--season", type=int,
+                        help="Temporada a simular (default: la última del dataset)")
+    parser.add_argument("--played-until", type=int, default=0,
+                        help="Usa los resultados reales hasta esta jornada y simula el resto (default: 0)")
+    parser.add_argument("--simulations", type=int, default=100000,
+                        help="Temporadas a simular (default: 100000)")
+    parser.add_argument("--relegated", type=int, default=3,
+                        help="Cantidad de equipos que descienden (default: 3)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Procesos que simulan chunks en paralelo (default: 1)")
+    parser.add_argument("--chunk-sims", type=int, default=CHUNK_SIMS,
+                        help=f"Simulaciones por chunk (default: {CHUNK_SIMS})")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--benchmark", type=int, nargs="+", metavar="WORKERS",
+                        help="Mide simulaciones por segundo con cada cantidad de workers indicada y termina")
+    parser.add_argument("--output",
+                        help="CSV con la distribución de posiciones de cada equipo")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    print("SIMULADOR DE TEMPORADAS")
+    print("=" * 50)
+
+    fixtures, season = load_fixtures(args.dataset, args.season)
+    teams, home, away, pending, base_table = build_season(fixtures, args.played_until)
+    rate_local, rate_visitante = get_goal_rates(fixtures[pending], args.model_type, args.run_name, args.version)
+    print(f"Temporada {season}: {len(teams)} equipos, {len(home)} partidos a simular "
+          f"({len(fixtures) - len(home)} ya jugados)")
+    if len(home) == 0:
+        print(f"La temporada terminó en la jornada {fixtures['jornada'].max()}: la tabla ya está definida "
+              f"(solo los empates exactos se sortean)")
+
+    if args.benchmark:
+        for workers in args.benchmark:
+            start_time = time.time()
+            simulate_season(rate_local, rate_visitante, home, away, len(teams), base_table, args.simulations,
+                            args.relegated, args.seed, workers, args.chunk_sims)
+            elapsed = time.time() - start_time
+            print(f"   {workers} workers: {args.simulations} temporadas en {elapsed:.2f} segundos "
+                  f"({args.simulations / elapsed:.0f} simulaciones/s)")
+        return
+
+    start_time = time.time()
+    results = simulate_season(rate_local, rate_visitante, home, away, len(teams), base_table, args.simulations,
+                              args.relegated, args.seed, args.workers, args.chunk_sims)
+    elapsed = time.time() - start_time
+    print(f"{args.simulations} temporadas simuladas en {elapsed:.2f} segundos "
+          f"({args.simulations / elapsed:.0f} simulaciones/s)")
+
+    print_table(teams, results, args.relegated)
+
+    if args.output:
+        positions = pd.DataFrame(results['positions'], index=teams,
+                                 columns=[f"posicion_{i + 1}" for i in range(len(teams))])
+        positions.insert(0, 'puntos_esperados', results['expected_points'])
+        positions.to_csv(args.output, index_label='equipo')
+        print(f"Distribución de posiciones guardada en {args.output}")
+
+if __name__ == "__main__":
+    main()
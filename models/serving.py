@@ -0,0 +1,517 @@
+import json
+import time
+import queue
+import argparse
+import threading
+import http.client
+from urllib.parse import urlsplit, parse_qs
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import numpy as np
+import pandas as pd
+import mlflow
+from mlflow.exceptions import MlflowException
+from mlflow.tracking import MlflowClient
+from dotenv import load_dotenv
+from model_cache import ModelCache, load_registered_model, resolve_version
+import os
+
+load_dotenv()
+
+tracking_uri = os.getenv("MLFLOW_TRACKING_URI")
+
+# Features con las que se entrenan los modelos registrados
+FEATURES = ['rating_local', 'rating_visitante']
+
+# Cantidad de latencias recientes usadas para calcular los percentiles
+LATENCY_WINDOW = 10000
+
+# Micro-batchers (runs) activos a la vez en el servicio
+MAX_BATCHERS = 32
+
+# Runs ya resueltos: (model_type, run_name) -> si están registrados como multi-salida.
+# Solo se guardan los runs cuyos modelos se pudieron cargar.
+_multi_output_runs = {}
+
+def is_not_found(error):
+    """
+    Indica si un error de MLflow es porque el modelo o la versión no existen
+    """
+    return isinstance(error, MlflowException) and error.error_code == "RESOURCE_DOES_NOT_EXIST"
+
+def get_model_names(model_type, run_name):
+    """
+    Nombres con los que register_in_mlflow registra los modelos de un run
+    """
+    return {
+        'local': f"{model_type}_JSON_Local_{run_name}",
+        'visitante': f"{model_type}_JSON_Visitante_{run_name}",
+        'multi': f"{model_type}_JSON_Multi_{run_name}"
+    }
+
+def get_registered_names(model_type, run_name):
+    """
+    Retorna los nombres registrados que hay que cargar para un run y si es
+    multi-salida. Una vez cargados los modelos de un run, el registry no se
+    vuelve a consultar. Los errores que no sean "no existe" (ej: de red) se
+    propagan sin cachear la respuesta.
+    """
+    key = (model_type, run_name)
+    names = get_model_names(model_type, run_name)
+    multi_output = _multi_output_runs.get(key)
+    if multi_output is None:
+        mlflow.set_tracking_uri(uri=tracking_uri)
+        try:
+            MlflowClient().get_registered_model(names['multi'])
+            multi_output = True
+        except MlflowException as e:
+            if not is_not_found(e):
+                raise
+            multi_output = False
+
+    if multi_output:
+        return [names['multi']], True
+    return [names['local'], names['visitante']], False
+
+def load_model_pair(model_type, run_name, version="latest", cache=None):
+    """
+    Carga el par de modelos local/visitante de un run, o el modelo
+    multi-salida si el run se entrenó con "multi_output": true.
+    Con una ModelCache, los modelos se toman de la cache.
+    Retorna (modelo local, modelo visitante, multi_output).
+    """
+    mlflow.set_tracking_uri(uri=tracking_uri)
+    names, multi_output = get_registered_names(model_type, run_name)
+    if cache is not None:
+        load = cache.get
+    else:
+        load = lambda name, version: load_registered_model(name, resolve_version(name, version))[0]
+
+    models = [load(name, version) for name in names]
+    _multi_output_runs[(model_type, run_name)] = multi_output
+    if multi_output:
+        return models[0], models[0], True
+    return models[0], models[1], False
+
+def preload_model_pairs(cache, runs, version="latest"):
+    """
+    Carga en segundo plano los modelos de los runs indicados como (model_type, run_name)
+    """
+    keys = [(name, version) for model_type, run_name in runs
+            for name in get_registered_names(model_type, run_name)[0]]
+    return cache.preload(keys)
+
+def predict_goals(model_pair, X):
+    """
+    Predice los goles esperados de local y visitante para una matriz de
+    ratings (una fila por partido, columnas en el orden de FEATURES)
+    """
+    reg_local, reg_visitante, multi_output = model_pair
+    X = pd.DataFrame(X, columns=FEATURES)
+    if multi_output:
+        y_pred = reg_local.predict(X)
+        return y_pred[:, 0], y_pred[:, 1]
+    return reg_local.predict(X), reg_visitante.predict(X)
+
+class PredictionServer(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer con una cola de conexiones pendientes acorde a
+    muchos clientes concurrentes
+    """
+    daemon_threads = True
+    request_queue_size = 128
+
+class LatencyStats:
+    """
+    Latencias y contadores del servicio. Los percentiles se calculan sobre
+    las últimas LATENCY_WINDOW requests.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._start_time = time.time()
+        self._requests = 0
+        self._rows = 0
+        self._batches = 0
+        self._batch_rows = 0
+
+    def observe_request(self, latency, rows):
+        with self._lock:
+            self._latencies.append(latency)
+            self._requests += 1
+            self._rows += rows
+
+    def observe_batch(self, rows):
+        with self._lock:
+            self._batches += 1
+            self._batch_rows += rows
+
+    def snapshot(self):
+        """
+        Retorna p50/p99 de latencia (ms), throughput y tamaño medio de los batches
+        """
+        with self._lock:
+            latencies = np.array(self._latencies, dtype=np.float64) * 1000
+            elapsed = time.time() - self._start_time
+            requests, rows, batches, batch_rows = self._requests, self._rows, self._batches, self._batch_rows
+
+        return {
+            'requests': requests,
+            'rows': rows,
+            'batches': batches,
+            'latency_p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else None,
+            'latency_p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else None,
+            'requests_per_second': requests / elapsed if elapsed > 0 else 0.0,
+            'rows_per_second': rows / elapsed if elapsed > 0 else 0.0,
+            'avg_batch_rows': batch_rows / batches if batches else 0.0,
+            'uptime_seconds': elapsed
+        }
+
+class MicroBatcher:
+    """
+    Agrupa las requests concurrentes en micro-batches: un thread junta filas
+    hasta max_batch_rows o hasta que pasan max_wait_ms desde la primera, y
+    resuelve todo el batch con una sola llamada a predict.
+    """
+
+    def __init__(self, predict_fn, max_batch_rows=256, max_wait_ms=5, stats=None):
+        self._predict_fn = predict_fn
+        self._max_batch_rows = max_batch_rows
+        self._max_wait = max_wait_ms / 1000
+        self._stats = stats
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def close(self):
+        """
+        Detiene el thread una vez resueltas las filas ya encoladas
+        """
+        self._queue.put(None)
+
+    def submit(self, X):
+        """
+        Encola una matriz de filas. Retorna un Future con (goles local, goles visitante).
+        """
+        future = Future()
+        self._queue.put((X, future))
+        return future
+
+    def _collect(self):
+        """
+        Junta las filas de un batch. Retorna (pendientes, si se pidió cerrar).
+        """
+        item = self._queue.get()
+        if item is None:
+            return [], True
+        pending = [item]
+        rows = len(item[0])
+        deadline = time.monotonic() + self._max_wait
+        while rows < self._max_batch_rows:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return pending, True
+            pending.append(item)
+            rows += len(item[0])
+        return pending, False
+
+    def _run(self):
+        closing = False
+        while not closing:
+            pending, closing = self._collect()
+            if pending:
+                self._predict_batch(pending)
+
+    def _predict_batch(self, pending):
+        X = np.concatenate([X for X, _ in pending])
+        try:
+            y_local, y_visitante = self._predict_fn(X)
+        except Exception as e:
+            if len(pending) == 1:
+                pending[0][1].set_exception(e)
+                return
+            # Se reintenta cada request por separado para que el error
+            # llegue solo a la que lo provoca y no a todo el batch
+            for item in pending:
+                self._predict_batch([item])
+            return
+
+        if self._stats is not None:
+            self._stats.observe_batch(len(X))
+
+        offset = 0
+        for X_request, future in pending:
+            end = offset + len(X_request)
+            future.set_result((y_local[offset:end], y_visitante[offset:end]))
+            offset = end
+
+def parse_payload(payload):
+    """
+    Convierte el cuerpo de una request ({"rating_local": .., "rating_visitante": ..}
+    o una lista de esos objetos) en una matriz de filas
+    """
+    single = isinstance(payload, dict)
+    rows = [payload] if single else payload
+    if not isinstance(rows, list) or not rows:
+        raise ValueError("Se espera un objeto o una lista no vacía de objetos")
+    X = np.array([[float(row[feature]) for feature in FEATURES] for row in rows], dtype=np.float64)
+    # json.loads acepta NaN e Infinity, que los modelos no pueden predecir
+    if not np.isfinite(X).all():
+        raise ValueError("Los ratings deben ser números finitos")
+    return X, single
+
+class BatcherRouter:
+    """
+    Un micro-batcher por par de modelos, creado la primera vez que se pide
+    un run cuyos modelos existen. Como mucho hay max_batchers activos: al
+    superarlo se cierra el usado menos recientemente. Cada batch toma sus
+    modelos de la ModelCache, por lo que un par que fue descartado de la
+    cache se vuelve a cargar al usarse.
+    """
+
+    def __init__(self, cache, default_run, version="latest", max_batch_rows=256, max_wait_ms=5, stats=None,
+                 max_batchers=MAX_BATCHERS):
+        self._cache = cache
+        self._default_run = default_run
+        self._version = version
+        self._max_batch_rows = max_batch_rows
+        self._max_wait_ms = max_wait_ms
+        self._stats = stats
+        self._max_batchers = max_batchers
+        self._lock = threading.Lock()
+        self._batchers = OrderedDict()
+
+    def submit(self, X, model_type=None, run_name=None):
+        """
+        Encola las filas en el micro-batcher del run pedido (por defecto, el
+        del servicio). Si el run es nuevo, primero carga sus modelos: si no
+        están registrados se propaga el MlflowException sin crear el batcher.
+        Retorna un Future con (goles local, goles visitante).
+        """
+        key = (model_type or self._default_run[0], run_name or self._default_run[1])
+        with self._lock:
+            if key in self._batchers:
+                self._batchers.move_to_end(key)
+                return self._batchers[key].submit(X)
+
+        # La carga se hace fuera del lock para no frenar a los demás runs
+        load_model_pair(*key, self._version, self._cache)
+
+        with self._lock:
+            if key not in self._batchers:
+                predict_fn = lambda X: predict_goals(load_model_pair(*key, self._version, self._cache), X)
+                self._batchers[key] = MicroBatcher(predict_fn, self._max_batch_rows, self._max_wait_ms, self._stats)
+                while len(self._batchers) > self._max_batchers:
+                    # Se cierra dentro del lock: ninguna request puede encolar después del cierre
+                    _, batcher = self._batchers.popitem(last=False)
+                    batcher.close()
+            self._batchers.move_to_end(key)
+            return self._batchers[key].submit(X)
+
+    def active_runs(self):
+        with self._lock:
+            return len(self._batchers)
+
+def make_handler(router, stats, cache):
+    """
+    Crea el handler HTTP del servicio:
+    - POST /predict[?model_type=..&run_name=..]: goles esperados para uno o
+      varios partidos, con el par de modelos del servicio o el indicado
+    - GET /stats: latencias p50/p99, throughput, contadores de la cache de modelos y runs activos
+    - GET /health
+    """
+
+    class PredictionHandler(BaseHTTPRequestHandler):
+        # Conexiones persistentes: todas las respuestas llevan Content-Length
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, body):
+            data = json.dumps(body).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                self._send_json(200, dict(stats.snapshot(), model_cache=cache.stats(), active_runs=router.active_runs()))
+            elif self.path == "/health":
+                self._send_json(200, {'status': 'ok'})
+            else:
+                self._send_json(404, {'error': 'not found'})
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            if url.path != "/predict":
+                self._send_json(404, {'error': 'not found'})
+                return
+            query = parse_qs(url.query)
+
+            start_time = time.perf_counter()
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                X, single = parse_payload(json.loads(self.rfile.read(length)))
+            except (ValueError, KeyError, TypeError) as e:
+                self._send_json(400, {'error': f"Payload inválido: {e}"})
+                return
+
+            try:
+                future = router.submit(X, query.get('model_type', [None])[0], query.get('run_name', [None])[0])
+                y_local, y_visitante = future.result()
+            except Exception as e:
+                self._send_json(404 if is_not_found(e) else 500, {'error': str(e)})
+                return
+
+            if single:
+                body = {'goles_local': float(y_local[0]), 'goles_visitante': float(y_visitante[0])}
+            else:
+                body = {'goles_local': y_local.tolist(), 'goles_visitante': y_visitante.tolist()}
+            self._send_json(200, body)
+            stats.observe_request(time.perf_counter() - start_time, len(X))
+
+        def log_message(self, format, *args):
+            # Sin un log por request: las métricas se consultan en /stats
+            pass
+
+    return PredictionHandler
+
+def create_server(cache, default_run, version="latest", host="127.0.0.1", port=8080,
+                  max_batch_rows=256, max_wait_ms=5):
+    """
+    Crea el servidor HTTP (un thread por conexión) con sus micro-batchers
+    """
+    stats = LatencyStats()
+    router = BatcherRouter(cache, default_run, version, max_batch_rows, max_wait_ms, stats)
+    server = PredictionServer((host, port), make_handler(router, stats, cache))
+    return server, stats
+
+def run_benchmark(server, requests, concurrency, rows_per_request=1, seed=42):
+    """
+    Envía requests concurrentes al servidor y retorna sus estadísticas
+    """
+    host, port = server.server_address[:2]
+    rng = np.random.default_rng(seed)
+    ratings = rng.uniform(50, 100, size=(requests, rows_per_request, 2))
+
+    # Una conexión persistente por thread cliente
+    local = threading.local()
+
+    def send(i):
+        payload = [dict(zip(FEATURES, row)) for row in ratings[i].tolist()]
+        if not hasattr(local, 'connection'):
+            local.connection = http.client.HTTPConnection(host, port, timeout=30)
+        try:
+            local.connection.request("POST", "/predict", body=json.dumps(payload),
+                                     headers={"Content-Type": "application/json"})
+            response = local.connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            local.connection.close()
+            del local.connection
+            return None
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        statuses = list(executor.map(send, range(requests)))
+    elapsed = time.time() - start_time
+
+    errors = sum(1 for status in statuses if status != 200)
+    print(f"\n{requests} requests ({concurrency} concurrentes, {rows_per_request} filas c/u) "
+          f"en {elapsed:.2f} segundos, {errors} errores")
+    return errors
+
+def print_stats(stats, cache):
+    """
+    Imprime las estadísticas del servicio
+    """
+    snapshot = stats.snapshot()
+    cache_stats = cache.stats()
+    print(f"   Requests: {snapshot['requests']} ({snapshot['rows']} filas) en {snapshot['batches']} batches "
+          f"({snapshot['avg_batch_rows']:.1f} filas por batch)")
+    if snapshot['latency_p50_ms'] is not None:
+        print(f"   Latencia p50: {snapshot['latency_p50_ms']:.2f} ms | p99: {snapshot['latency_p99_ms']:.2f} ms")
+    print(f"   Throughput: {snapshot['requests_per_second']:.1f} requests/s | "
+          f"{snapshot['rows_per_second']:.1f} filas/s")
+    print(f"   Cache de modelos: {cache_stats['models']} modelos ({cache_stats['bytes'] / 1024 / 1024:.1f} MB) | "
+          f"hits: {cache_stats['hits']} | misses: {cache_stats['misses']} | descartes: {cache_stats['evictions']}")
+
+def parse_args():
+    """
+    Parsea los argumentos de línea de comandos
+    """
+    parser = argparse.ArgumentParser(description="Servicio HTTP de predicción de goles con modelos registrados")
+    parser.add_argument("--model-type", required=True,
+                        help="Tipo de modelo registrado (ej: RandomForestRegressor)")
+    parser.add_argument("--run-name", required=True,
+                        help="run_name de la configuración (ej: RF_config_01)")
+    parser.add_argument("--version", default="latest",
+                        help="Versión de los modelos registrados (default: latest)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--max-batch-rows", type=int, default=256,
+                        help="Filas máximas por micro-batch (default: 256)")
+    parser.add_argument("--max-wait-ms", type=float, default=5,
+                        help="Espera máxima para completar un micro-batch en ms (default: 5)")
+    parser.add_argument("--cache-mb", type=int, default=512,
+                        help="Memoria máxima de la cache de modelos en MB, según su tamaño serializado (default: 512)")
+    parser.add_argument("--preload", nargs="*", default=[], metavar="MODEL_TYPE:RUN_NAME",
+                        help="Runs adicionales a cargar en segundo plano (ej: GradientBoostingRegressor:GB_config_01)")
+    parser.add_argument("--benchmark", type=int, default=0,
+                        help="Envía N requests al servicio, imprime las estadísticas y termina")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Requests concurrentes del benchmark (default: 16)")
+    parser.add_argument("--rows-per-request", type=int, default=1,
+                        help="Partidos por request del benchmark (default: 1)")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    print("SERVICIO DE PREDICCIÓN")
+    print("=" * 50)
+
+    cache = ModelCache(max_bytes=args.cache_mb * 1024 * 1024)
+
+    start_time = time.time()
+    model_pair = load_model_pair(args.model_type, args.run_name, args.version, cache)
+    print(f"Modelos de {args.run_name} cargados en {time.time() - start_time:.2f} segundos"
+          f"{' (multi-salida)' if model_pair[2] else ''}")
+
+    if args.preload:
+        runs = [tuple(run.split(":", 1)) for run in args.preload]
+        preload_model_pairs(cache, runs, args.version)
+        print(f"Precargando {len(runs)} runs en segundo plano")
+
+    port = 0 if args.benchmark else args.port
+    server, stats = create_server(cache, (args.model_type, args.run_name), args.version, args.host, port,
+                                  args.max_batch_rows, args.max_wait_ms)
+
+    if args.benchmark:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        run_benchmark(server, args.benchmark, args.concurrency, args.rows_per_request)
+        print_stats(stats, cache)
+        server.shutdown()
+        return
+
+    host, port = server.server_address[:2]
+    print(f"Escuchando en http://{host}:{port} (POST /predict, GET /stats, GET /health)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nDeteniendo servicio...")
+        print_stats(stats, cache)
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
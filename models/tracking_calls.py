@@ -0,0 +1,45 @@
+import threading
+from contextlib import contextmanager
+import requests
+
+# Contador activo de cada thread (los registros en segundo plano cuentan por separado)
+_local = threading.local()
+_install_lock = threading.Lock()
+_original_send = None
+
+def _counting_send(self, request, **kwargs):
+    counter = getattr(_local, 'counter', None)
+    if counter is not None and counter['prefix'] and request.url.startswith(counter['prefix']):
+        counter['calls'] += 1
+    return _original_send(self, request, **kwargs)
+
+def install():
+    """
+    Envuelve requests.Session.send (que usa el cliente REST de MLflow, tanto
+    para tracking y registry como para subir artefactos a través del
+    servidor) para poder contar las requests. Sin un contador activo en el
+    thread, las requests pasan sin cambios.
+    """
+    global _original_send
+    with _install_lock:
+        if _original_send is None:
+            _original_send = requests.Session.send
+            requests.Session.send = _counting_send
+
+@contextmanager
+def count_tracking_calls(tracking_uri):
+    """
+    Cuenta las requests HTTP al tracking server hechas por el thread actual
+    dentro del bloque. Con un store local (file:, sqlite:) no hay requests
+    y el contador queda en 0. Entrega un dict con 'calls'.
+    """
+    install()
+    uri = tracking_uri or ""
+    prefix = uri.rstrip('/') if uri.startswith(("http://", "https://")) else None
+    counter = {'prefix': prefix, 'calls': 0}
+    previous = getattr(_local, 'counter', None)
+    _local.counter = counter
+    try:
+        yield counter
+    finally:
+        _local.counter = previous
@@ -0,0 +1,169 @@
+import os
+import copy
+import numpy as np
+import mlflow
+from predictor_from_json import (tracking_uri, uses_native_multi_output, fit_models, predict_models,
+                                 print_results, register_in_mlflow, calculate_metrics)
+from dataset_cache import load_train_test_split
+from result_cache import get_config_hash, find_finished_run
+
+def grow_models(config, reg_local, reg_visitante, X_train, y_train_local, y_train_visitante):
+    """
+    Agrega árboles a los modelos ya entrenados hasta el n_estimators de la configuración
+    """
+    n_estimators = config['parameters']['n_estimators']
+    if uses_native_multi_output(config):
+        reg_local.set_params(n_estimators=n_estimators)
+        reg_local.fit(X_train, np.column_stack([y_train_local, y_train_visitante]))
+        return reg_local, reg_local
+
+    for reg, y_train in ((reg_local, y_train_local), (reg_visitante, y_train_visitante)):
+        reg.set_params(n_estimators=n_estimators)
+        reg.fit(X_train, y_train)
+    return reg_local, reg_visitante
+
+def snapshot_models(reg_local, reg_visitante):
+    """
+    Copia los modelos para registrarlos sin que el crecimiento posterior los
+    modifique (el registro puede estar encolado en segundo plano)
+    """
+    local_copy = copy.deepcopy(reg_local).set_params(warm_start=False)
+    if reg_visitante is reg_local:
+        return local_copy, local_copy
+    return local_copy, copy.deepcopy(reg_visitante).set_params(warm_start=False)
+
+def truncate_boosting(reg, n_estimators):
+    """
+    Retorna una copia de un GradientBoostingRegressor con solo sus primeras
+    n_estimators etapas, equivalente al modelo entrenado con ese n_estimators.
+    Las etapas se comparten con el original, que no se vuelve a modificar.
+    Con early stopping (n_iter_no_change) el original puede tener menos etapas.
+    """
+    n_stages = min(n_estimators, reg.n_estimators_)
+    truncated = copy.copy(reg)
+    truncated.estimators_ = reg.estimators_[:n_stages].copy()
+    truncated.train_score_ = reg.train_score_[:n_stages].copy()
+    for attribute in ('oob_improvement_', 'oob_scores_'):
+        if hasattr(reg, attribute):
+            setattr(truncated, attribute, getattr(reg, attribute)[:n_stages].copy())
+    if hasattr(reg, 'oob_scores_'):
+        truncated.oob_score_ = truncated.oob_scores_[-1]
+    truncated.n_estimators = n_estimators
+    truncated.n_estimators_ = n_stages
+    return truncated
+
+def staged_predictions(reg, X, stages):
+    """
+    Predice con staged_predict y conserva solo las etapas pedidas (limitadas
+    a las que efectivamente se entrenaron)
+    """
+    wanted = {min(stage, reg.n_estimators_) for stage in stages}
+    predictions = {}
+    for stage, y_pred in enumerate(reg.staged_predict(X), 1):
+        if stage in wanted:
+            predictions[stage] = y_pred
+            if len(predictions) == len(wanted):
+                break
+    return {stage: predictions[min(stage, reg.n_estimators_)] for stage in stages}
+
+def iter_warm_start_models(configs, data):
+    """
+    Hace crecer un único ensamble (warm_start=True) por las configuraciones y
+    genera en cada tamaño (modelo local, modelo visitante, predicciones local,
+    predicciones visitante)
+    """
+    X_train, X_test, y_train_local, _, y_train_visitante, _ = data
+    reg_local = reg_visitante = None
+    for config in configs:
+        if reg_local is None:
+            warm_config = copy.deepcopy(config)
+            warm_config['parameters']['warm_start'] = True
+            reg_local, reg_visitante = fit_models(warm_config, X_train, y_train_local, y_train_visitante)
+        else:
+            print(f"\n Agregando árboles hasta n_estimators={config['parameters']['n_estimators']}...")
+            reg_local, reg_visitante = grow_models(config, reg_local, reg_visitante,
+                                                   X_train, y_train_local, y_train_visitante)
+
+        y_pred_local, y_pred_visitante = predict_models(config, reg_local, reg_visitante, X_test)
+        yield snapshot_models(reg_local, reg_visitante) + (y_pred_local, y_pred_visitante)
+
+def iter_staged_models(configs, data):
+    """
+    Entrena una sola vez el GradientBoosting más grande y evalúa los tamaños
+    menores con staged_predict, sin reentrenar. Genera lo mismo que
+    iter_warm_start_models, con copias truncadas del modelo para registrar.
+    """
+    X_train, X_test, y_train_local, _, y_train_visitante, _ = data
+    stages = [config['parameters']['n_estimators'] for config in configs]
+
+    reg_local, reg_visitante = fit_models(configs[-1], X_train, y_train_local, y_train_visitante)
+    print(f"\n Evaluando etapas {stages} con staged_predict...")
+    predictions_local = staged_predictions(reg_local, X_test, stages)
+    predictions_visitante = staged_predictions(reg_visitante, X_test, stages)
+
+    for stage in stages:
+        yield (truncate_boosting(reg_local, stage), truncate_boosting(reg_visitante, stage),
+               predictions_local[stage], predictions_visitante[stage])
+
+def train_warm_start_family(configs, force=None, uploader=None):
+    """
+    Entrena una familia de configuraciones que solo difieren en n_estimators
+    (ordenadas de menor a mayor) y genera las métricas de cada configuración,
+    registrando un run por tamaño como si se hubiera entrenado desde cero.
+
+    RandomForest usa un único ensamble que crece con warm_start=True: los
+    árboles que ya existen no se vuelven a entrenar, y una familia 50→100→200
+    cuesta lo mismo que un único ajuste de 200 árboles. GradientBoosting
+    entrena solo el tamaño más grande y evalúa el resto con staged_predict.
+    """
+    if force is None:
+        force = os.getenv("FORCE_RETRAIN", "false").lower() in ("1", "true", "yes")
+
+    mlflow.set_tracking_uri(uri=tracking_uri)
+    experiment = mlflow.set_experiment(configs[0]['experiment_name'])
+
+    cached_runs = [None] * len(configs)
+    if not force:
+        cached_runs = [find_finished_run(experiment.experiment_id, get_config_hash(config)) for config in configs]
+
+    # Solo hace falta entrenar hasta la última configuración sin run previo
+    pending = [i for i, cached_run in enumerate(cached_runs) if cached_run is None]
+    last_pending = pending[-1] if pending else -1
+
+    print(f"\n Familia warm start: {configs[0]['model_type']} con n_estimators "
+          f"{[config['parameters']['n_estimators'] for config in configs]}")
+
+    if last_pending >= 0:
+        data = load_train_test_split(configs[0]['dataset'], configs[0]['training'])
+        X_train, _, _, y_test_local, _, y_test_visitante = data
+        if configs[0]['model_type'] == "GradientBoostingRegressor":
+            models = iter_staged_models(configs[:last_pending + 1], data)
+        else:
+            models = iter_warm_start_models(configs[:last_pending + 1], data)
+
+    for i, config in enumerate(configs):
+        print(f"\n Iniciando entrenamiento: {config['run_name']}")
+        print(f"Parámetros: {config['parameters']}")
+
+        if i <= last_pending:
+            model_local, model_visitante, y_pred_local, y_pred_visitante = next(models)
+
+        if cached_runs[i] is not None:
+            print(f"\nConfiguración sin cambios, no se {'registra' if i <= last_pending else 'reentrena'}.")
+            print(f"Run existente: {cached_runs[i].info.run_id} ({cached_runs[i].info.run_name})")
+            yield dict(cached_runs[i].data.metrics)
+            continue
+
+        print("\nCalculando métricas...")
+        metrics = calculate_metrics(y_test_local, y_pred_local, y_test_visitante, y_pred_visitante)
+        print_results(metrics)
+
+        if uploader is not None:
+            uploader.submit(config['run_name'], config, metrics, model_local, model_visitante, X_train, y_pred_local,
+                            experiment_id=experiment.experiment_id)
+            print(f"\n Registro en MLflow encolado en segundo plano ({uploader.pending()} pendientes)")
+        else:
+            register_in_mlflow(config, metrics, model_local, model_visitante, X_train, y_pred_local,
+                               experiment_id=experiment.experiment_id)
+
+        yield metrics
@@ -0,0 +1,36 @@
+import os
+from threadpoolctl import threadpool_limits
+
+# Variables con las que joblib/loky y las librerías BLAS/OpenMP limitan sus núcleos
+WORKER_ENV_VARS = ("LOKY_MAX_CPU_COUNT", "OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+def get_worker_env(workers):
+    """
+    Construye el entorno de cada worker repartiendo los núcleos disponibles.
+
+    Los modelos con n_jobs=-1 (RandomForest) usan todos los núcleos que
+    reporta joblib; limitándolo por worker se evita que N experimentos en
+    paralelo compitan por los mismos núcleos.
+    """
+    cores_per_worker = max(1, (os.cpu_count() or 1) // max(1, workers))
+    env = os.environ.copy()
+    for var in WORKER_ENV_VARS:
+        env[var] = str(cores_per_worker)
+    return env
+
+def get_worker_limits(workers):
+    """
+    Solo las variables del reparto de núcleos, para pasarlas al initializer de un pool
+    """
+    env = get_worker_env(workers)
+    return {var: env[var] for var in WORKER_ENV_VARS}
+
+def apply_worker_env(worker_env):
+    """
+    Aplica el reparto de núcleos dentro de un worker ya creado. Con fork,
+    numpy y BLAS ya están cargados y no vuelven a leer las variables de
+    entorno, por lo que los hilos de BLAS/OpenMP se limitan con threadpoolctl.
+    LOKY_MAX_CPU_COUNT sí se lee cada vez que joblib arma un pool.
+    """
+    os.environ.update(worker_env)
+    threadpool_limits(int(worker_env["OMP_NUM_THREADS"]))
@@ -17,6 +17,7 @@ resource "aws_lambda_function" "this" {
     filename         = "${var.api_folder}/${var.name}.zip"
     source_code_hash = filebase64sha256("${var.api_folder}/${var.name}.zip")
     layers           = [aws_lambda_layer_version.this.arn]
+    timeout          = var.timeout
 
     environment {
         variables = var.env_vars
@@ -17,4 +17,9 @@ variable "api_folder" {
 variable "env_vars" {
     type = map(string)
     default = {}
-}
\ No newline at end of file
+}
+
+variable "timeout" {
+    type    = number
+    default = 10
+}
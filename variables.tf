@@ -142,6 +142,12 @@ variable "lambda_names" {
   }))
 }
 
+# Seconds before AWS kills an invocation; the exporter's scrape deadline is derived from it
+variable "lambda_timeout" {
+  type    = number
+  default = 10
+}
+
 variable "api_folder" {
   type    = string
   default = "./api"